@@ -1,26 +1,76 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.db import SupabasePool, UserSupabaseClient, get_supabase_pool
+import hashlib
 import jwt
+import time
 from typing import Dict, Any
 
 
 security = HTTPBearer()
 
+# Verified user data keyed by token hash; entries never outlive the token's exp
+_user_cache = TTLCache(max_size=settings.auth_user_cache_max_size, ttl=settings.auth_user_cache_ttl)
+
+
+def auth_user_cache_stats() -> dict:
+    """Size and hit/miss counters of the verified-user cache."""
+    return _user_cache.stats()
+
 
 class AuthenticatedUser:
     """Unified dependency class that provides both user information and authenticated Supabase client."""
     
-    def __init__(self, user_id: str, user_data: Dict[str, Any], client: Client):
+    def __init__(self, user_id: str, user_data: Dict[str, Any], client: UserSupabaseClient):
         self.user_id = user_id
         self.user_data = user_data
         self.client = client
 
 
-def get_supabase_client() -> Client:
+def _user_data_from_claims(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Build user data from verified JWT claims, mirroring the GoTrue user fields."""
+    return {
+        "id": payload["sub"],
+        "aud": payload.get("aud"),
+        "role": payload.get("role"),
+        "email": payload.get("email"),
+        "phone": payload.get("phone"),
+        "app_metadata": payload.get("app_metadata", {}),
+        "user_metadata": payload.get("user_metadata", {}),
+        "is_anonymous": payload.get("is_anonymous", False),
+    }
+
+
+async def _get_user_data(pool: SupabasePool, token: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve user data according to settings.auth_user_mode."""
+    if settings.auth_user_mode == "claims":
+        return _user_data_from_claims(payload)
+
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    if settings.auth_user_mode == "cached":
+        cached = _user_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    response = await pool.auth.get_user(token)
+    if not response.user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+
+    user_data = response.user.model_dump()
+    if settings.auth_user_mode == "cached":
+        _user_cache.set(cache_key, user_data, ttl=payload.get("exp", 0) - time.time())
+    return user_data
+
+
+async def get_supabase_client() -> AsyncClient:
     """Get Supabase client instance."""
-    return create_client(settings.supabase_url, settings.supabase_anon_key)
+    return await acreate_client(settings.supabase_url, settings.supabase_anon_key)
 
 
 async def get_authenticated_user(
@@ -55,20 +105,13 @@ async def get_authenticated_user(
         if not user_id:
             raise HTTPException(status_code=401, detail="User ID not found in token")
 
-        # Step 2: Create authenticated client
-        supabase_client = create_client(settings.supabase_url, settings.supabase_anon_key)
-        supabase_client.auth.set_session(access_token=token, refresh_token=token)
+        # Step 2: Per-request view over the shared pool, carrying only the user's token
+        pool = get_supabase_pool()
+        supabase_client = pool.for_user(token)
 
-        # Step 3: Get user data from Supabase
-        response = supabase_client.auth.get_user(token)
-        if not response.user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
+        # Step 3: Get user data (GoTrue, cache or verified claims depending on settings)
+        user_data = await _get_user_data(pool, token, payload)
 
-        user_data = response.user.model_dump()
-        
         return AuthenticatedUser(
             user_id=user_id,
             user_data=user_data,
@@ -86,15 +129,14 @@ async def get_authenticated_user(
 # Legacy dependencies - kept for backward compatibility
 async def get_current_user_supabase_client(
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> Client:
+) -> UserSupabaseClient:
     """Legacy dependency - use get_authenticated_user instead."""
     auth_user = await get_authenticated_user(credentials)
     return auth_user.client
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    supabase: Client = Depends(get_supabase_client)
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> Dict[str, Any]:
     """Legacy dependency - use get_authenticated_user instead."""
     auth_user = await get_authenticated_user(credentials)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from uuid import UUID
 import asyncio
@@ -6,7 +6,7 @@ from app.api.deps import get_current_user_supabase_client, get_current_user
 from app.schemas.admin import ProcessArticleRequest, SimpleArticleGenerationRequest, SimpleArticleGenerationResponse
 from app.services.article_adaptor import adapt_article
 from app.services.article_generator import SimpleArticleService
-from supabase import Client
+from supabase import AsyncClient
 
 router = APIRouter()
 
@@ -14,7 +14,10 @@ router = APIRouter()
 async def process_article(
     article_id: int,
     request: ProcessArticleRequest,
-    supabase: Client = Depends(get_current_user_supabase_client),
+    use_cache: bool = Query(
+        True, description="Reuse the stored adaptation; false adapts the article again and overwrites it"
+    ),
+    supabase: AsyncClient = Depends(get_current_user_supabase_client),
 ) -> str:
     """
     Process an article with the given ID.
@@ -26,6 +29,7 @@ async def process_article(
             initial_lang=request.initial_lang,
             target_lang=request.target_lang,
             supabase=supabase,
+            use_cache=use_cache,
         )
         return str(result)
     except Exception as e:
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, Query
 from typing import List, Optional
-from supabase import Client
+from supabase import AsyncClient
 from app.api.deps import get_current_user_supabase_client, get_current_user
 from app.schemas.articles import AdaptedArticleData, DiscoverArticleData
 from app.services.articles import get_articles, get_discover_articles
@@ -15,7 +15,7 @@ async def get_article_list(
     category: Optional[str] = Query(None, description="Filter by category"),
     language: Optional[str] = Query(None, description="Filter by language"),
     level: Optional[str] = Query(None, description="Filter by level"),
-    supabase: Client = Depends(get_current_user_supabase_client)
+    supabase: AsyncClient = Depends(get_current_user_supabase_client)
 ):
     """
     Get a list of articles with optional filters.
@@ -32,7 +32,7 @@ async def get_article_list(
 
 @router.post("/generate", response_model=Dict[str, List[Dict[str, Any]]])
 async def generate_articles(
-    supabase: Client = Depends(get_current_user_supabase_client),
+    supabase: AsyncClient = Depends(get_current_user_supabase_client),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
@@ -54,7 +54,7 @@ async def discover_articles(
     level: Optional[str] = Query(None, description="Filter by level"),
     limit: int = Query(20, description="Number of articles to return"),
     offset: int = Query(0, description="Offset for pagination"),
-    supabase: Client = Depends(get_current_user_supabase_client),
+    supabase: AsyncClient = Depends(get_current_user_supabase_client),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
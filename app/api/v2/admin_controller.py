@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import Client
+from supabase import AsyncClient
 from app.api.deps import get_supabase_client
 from app.schemas.auth import SignInRequest, SignInResponse
 from gotrue.errors import AuthApiError
@@ -10,14 +10,14 @@ router = APIRouter()
 @router.post("/signin", response_model=SignInResponse)
 async def sign_in(
         credentials: SignInRequest,
-        supabase: Client = Depends(get_supabase_client)
+        supabase: AsyncClient = Depends(get_supabase_client)
 ):
     """
     Sign in user with email and password.
     Returns access token and user information.
     """
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await supabase.auth.sign_in_with_password({
             "email": credentials.email,
             "password": credentials.password
         })
@@ -1,44 +1,112 @@
-from fastapi import APIRouter, Depends, Query
-from typing import List, Dict, Any
-from app.schemas.articles import DiscoverArticleData
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from typing import List, Dict, Any, Optional
+from uuid import UUID
+from app.schemas.admin import SimpleArticleGenerationResponse
+from app.schemas.articles import DiscoverArticleData, GenerationJobStatus
 from app.api.deps import get_authenticated_user
+from app.services.job_queue import job_queue
 from app.services.user_article_service import UserArticleService
 
 router = APIRouter()
 
 @router.get("/discover", response_model=List[DiscoverArticleData])
 async def discover_articles(
+        response: Response,
         limit: int = Query(5, description="Number of articles to return"),
-        offset: int = Query(0, description="Offset for pagination"),
+        offset: int = Query(0, description="Offset for pagination (legacy, use cursor)"),
+        cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page"),
         auth_user = Depends(get_authenticated_user)
 ):
     """
     Discover articles assigned to the current user.
 
-    Returns articles specifically assigned to the authenticated user.
+    Returns articles specifically assigned to the authenticated user. The cursor of the next page is
+    returned in the X-Next-Cursor header (absent on the last page).
     """
     service = UserArticleService(auth_user.client)
-    discover_articles_list = await service.get_user_assigned_articles(
-        user_id=auth_user.user_id,
-        limit=limit,
-        offset=offset
-    )
+    try:
+        discover_articles_list, next_cursor = await service.get_user_assigned_articles_page(
+            user_id=auth_user.user_id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return discover_articles_list
 
 
-@router.post("/generate", response_model=Dict[str, List[Dict[str, Any]]])
+@router.post("/generate", response_model=SimpleArticleGenerationResponse, status_code=status.HTTP_202_ACCEPTED)
 async def generate_articles(
+        idempotency_key: Optional[str] = Header(
+            None, alias="Idempotency-Key", max_length=255,
+            description="Client-chosen key; retries with the same key return the original job"
+        ),
         auth_user = Depends(get_authenticated_user)
 ):
     """
-    Generate and assign new articles to the authenticated user.
+    Start generating and assigning new articles to the authenticated user.
 
-    Returns up to 3 newly assigned articles.
+    Returns a request id right away; poll GET /jobs/{request_id} and fetch GET /jobs/{request_id}/result.
+    A retry sent with the same Idempotency-Key returns the same request id without starting new work, and
+    so does any request made while the user's previous generation job is still queued or running.
     """
-    service = UserArticleService(auth_user.client)
-    articles = await service.generate_and_assign_articles(
-        user_id=auth_user.user_id,
-        count=3
+    count = 3
+    job = await job_queue.submit(
+        auth_user.client,
+        auth_user.user_id,
+        kind="generate_articles",
+        params={"count": count},
+        idempotency_key=idempotency_key
+    )
+
+    return SimpleArticleGenerationResponse(
+        request_id=job["id"],
+        message="Article generation started",
+        estimated_articles=count
+    )
+
+
+async def _get_job_or_404(auth_user, job_id: UUID) -> Dict[str, Any]:
+    job = await job_queue.get(auth_user.client, auth_user.user_id, str(job_id))
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=GenerationJobStatus)
+async def get_generation_job(
+        job_id: UUID,
+        auth_user = Depends(get_authenticated_user)
+):
+    """Get the status and progress of an article generation job."""
+    job = await _get_job_or_404(auth_user, job_id)
+    return GenerationJobStatus(
+        request_id=job["id"],
+        status=job["status"],
+        progress=job.get("progress"),
+        error=job.get("error"),
+        created_at=job.get("created_at"),
+        updated_at=job.get("updated_at")
     )
 
-    return {"articles": articles}
\ No newline at end of file
+
+@router.get("/jobs/{job_id}/result", response_model=Dict[str, List[Dict[str, Any]]])
+async def get_generation_job_result(
+        job_id: UUID,
+        auth_user = Depends(get_authenticated_user)
+):
+    """
+    Get the articles assigned by a completed generation job.
+
+    Returns 409 while the job is still queued or running.
+    """
+    job = await _get_job_or_404(auth_user, job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=job.get("error") or "Job failed")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job['status']}")
+    return job["result"]
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from app.api.deps import get_authenticated_user
 from app.schemas.dialogs import DialogResponse, SendMessageRequest, DialogFollowUpResponseLLMSchema
+from app.core.config import settings
 from app.services.dialogs import (
     get_or_create_dialog as get_or_create_dialog_service,
-    add_message_to_dialog as add_message_to_dialog_service
+    get_dialog_messages_page as get_dialog_messages_page_service,
+    add_message_to_dialog as add_message_to_dialog_service,
+    stream_message_to_dialog as stream_message_to_dialog_service
 )
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.schemas.dialogs import Message
 
 router = APIRouter()
@@ -15,9 +21,40 @@ async def get_or_create_dialog(
     adapted_article_id: int,
     auth_user = Depends(get_authenticated_user)
 ):
-    """Get or create a dialog for the authenticated user and article."""
+    """
+    Get or create a dialog for the authenticated user and article.
+
+    Only the newest page of messages is included; older ones are loaded with
+    GET /{dialog_id}/messages?cursor=<olderMessagesCursor>.
+    """
     return await get_or_create_dialog_service(auth_user.client, auth_user.user_id, adapted_article_id)
 
+
+@router.get("/{dialog_id}/messages", response_model=List[Message])
+async def get_dialog_messages(
+    dialog_id: str,
+    response: Response,
+    limit: int = Query(settings.dialog_messages_page_size, ge=1, le=100, description="Number of messages to return"),
+    cursor: Optional[str] = Query(None, description="olderMessagesCursor of the dialog or X-Next-Cursor of the previous page"),
+    auth_user = Depends(get_authenticated_user)
+):
+    """
+    Load older messages of a dialog, in chronological order.
+
+    The cursor of the next (older) page is returned in the X-Next-Cursor header (absent once the
+    start of the dialog is reached).
+    """
+    try:
+        messages, next_cursor = await get_dialog_messages_page_service(
+            auth_user.client, dialog_id, auth_user.user_id, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return messages
+
 @router.post("/{dialog_id}/messages", response_model=Message)
 async def send_message_to_dialog(
     dialog_id: str,
@@ -25,4 +62,25 @@ async def send_message_to_dialog(
     auth_user = Depends(get_authenticated_user)
 ):
     """Send a message to an existing dialog."""
-    return await add_message_to_dialog_service(auth_user.client, dialog_id, auth_user.user_id, request)
\ No newline at end of file
+    return await add_message_to_dialog_service(auth_user.client, dialog_id, auth_user.user_id, request)
+
+
+@router.post("/{dialog_id}/messages/stream")
+async def stream_message_to_dialog(
+    dialog_id: str,
+    request: SendMessageRequest,
+    auth_user = Depends(get_authenticated_user)
+):
+    """
+    Send a message to an existing dialog and stream the reply as Server-Sent Events.
+
+    `token` events carry pieces of the follow-up question as they arrive; the final `message`
+    event carries the saved Message with the full metadata.
+    """
+    events = await stream_message_to_dialog_service(auth_user.client, dialog_id, auth_user.user_id, request)
+
+    async def event_stream():
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -8,6 +8,25 @@ class Settings(BaseSettings):
     supabase_anon_key: str
     supabase_jwt_secret: str
     project_name: str
+    # Only needed for background work that runs without a user token (e.g. resuming jobs after a restart)
+    supabase_service_role_key: Optional[str] = None
+
+    # Shared Supabase connection pool
+    supabase_pool_max_connections: int = 100
+    supabase_pool_max_keepalive: int = 20
+    supabase_pool_keepalive_expiry: float = 30.0
+
+    # How get_authenticated_user builds user data after verifying the JWT locally:
+    # "remote" - ask GoTrue on every request (revocation is seen immediately)
+    # "cached" - ask GoTrue once, then reuse for auth_user_cache_ttl seconds (never past token exp)
+    # "claims" - trust the verified claims, no GoTrue call (staleness bounded by token exp)
+    auth_user_mode: Literal["remote", "cached", "claims"] = "cached"
+    auth_user_cache_ttl: int = 60
+    auth_user_cache_max_size: int = 10000
+
+    # user_settings rows cached per user_id; writes through app.services.user_settings invalidate them
+    user_settings_cache_ttl: int = 300
+    user_settings_cache_max_size: int = 10000
     
     # API Configuration
     api_v1_str: str = "/api/v1"
@@ -17,6 +36,66 @@ class Settings(BaseSettings):
     openrouter_api_base: str = "https://openrouter.ai/api/v1"
     openrouter_api_key: str
     openrouter_model_name: str
+    llm_chain_cache_size: int = 32
+    llm_max_connections: int = 20
+    llm_max_keepalive: int = 10
+    # Process-wide cap on in-flight calls per model (keeps us under OpenRouter rate limits)
+    llm_max_concurrency: int = 4
+    llm_extended_max_concurrency: int = 2
+    # Mark the static system prompt with a cache_control breakpoint (needed by Anthropic models,
+    # OpenAI/DeepSeek/Gemini cache long prefixes automatically)
+    llm_prompt_cache_control: bool = False
+    # How answers are held to the output schema:
+    # "prompt"      - schema in the prompt (format_instructions), parsed and repaired locally
+    # "json_mode"   - as "prompt", plus response_format json_object so the answer is always JSON
+    # "json_schema" - response_format json_schema; the schema dump is dropped from the prompt
+    # A model that rejects response_format falls back to "prompt" for the rest of the process.
+    llm_output_mode: Literal["prompt", "json_mode", "json_schema"] = "prompt"
+    llm_extended_output_mode: Literal["prompt", "json_mode", "json_schema"] = "prompt"
+    # Share of LLM calls whose full prompt arguments and answer are logged (0 = none, 1 = all)
+    llm_prompt_log_sample_rate: float = 0.0
+    # Response cache for deterministic prompts (callLLM(..., use_cache=True)); "none" disables it
+    llm_cache_backend: Literal["none", "memory", "sqlite"] = "memory"
+    llm_cache_ttl: int = 7 * 24 * 3600
+    llm_cache_max_entries: int = 1000
+    llm_cache_path: str = ".cache/llm_responses.sqlite3"
+
+    # Dialog context window: rolling summary + newest messages within a token budget
+    dialog_recent_messages: int = 10
+    dialog_summary_batch: int = 6
+    dialog_history_token_budget: int = 1500
+    dialog_article_token_budget: int = 1200
+    # Messages returned per page by GET /dialogs/{id} and GET /dialogs/{id}/messages
+    dialog_messages_page_size: int = 30
+
+    # Targets adapted per LLM call by batch adaptation (each target adds a full adapted article to the answer)
+    adaptation_batch_size: int = 3
+
+    # Articles generated per extended-model call by batch generation (each is ~1000 words of output)
+    article_generation_batch_size: int = 3
+
+    # MinHash near-duplicate detection of source articles (estimated Jaccard similarity of word 3-grams)
+    near_duplicate_threshold: float = 0.5
+    # Stored articles of the same category a new article is compared with
+    near_duplicate_window_days: int = 14
+    # Seconds a worker keeps a category index before reloading it, to see articles stored by other workers
+    near_duplicate_index_ttl: int = 3600
+    # Recent assignments of a user whose articles are not handed out again as near-duplicates
+    near_duplicate_user_history: int = 50
+
+    # Background job queue
+    job_workers: int = 2
+    # A running job renews its lease every third of this; another process takes over a job whose lease expired
+    job_lease_seconds: int = 600
+
+    # Background inventory replenisher (needs SUPABASE_SERVICE_ROLE_KEY): keeps unassigned adapted
+    # articles in stock per (learning language, level, category) found in user_settings
+    inventory_enabled: bool = False
+    inventory_check_interval: int = 300
+    # Refill a combination below low_water up to high_water, at most refill_budget articles per check
+    inventory_low_water: int = 5
+    inventory_high_water: int = 15
+    inventory_refill_budget: int = 10
     
     
     class Config:
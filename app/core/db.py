@@ -0,0 +1,110 @@
+"""Process-wide Supabase transport shared by all requests."""
+from typing import Any, Dict, Optional
+
+from gotrue import AsyncGoTrueClient
+from httpx import AsyncClient, Headers, Limits, Response
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS, DEFAULT_POSTGREST_CLIENT_TIMEOUT
+
+from app.core.config import settings
+
+
+class _UserSession:
+    """Stand-in for the PostgREST http session that adds the user's headers to each request on the shared pool."""
+
+    def __init__(self, http_client: AsyncClient, headers: Dict[str, str]):
+        self._http_client = http_client
+        self.headers = Headers(headers)
+
+    async def request(self, method: str, url: str, *, headers: Optional[Headers] = None, **kwargs: Any) -> Response:
+        merged = self.headers.copy()
+        if headers:
+            merged.update(headers)
+        return await self._http_client.request(method, url, headers=merged, **kwargs)
+
+
+class UserSupabaseClient(AsyncPostgrestClient):
+    """
+    Lightweight per-request PostgREST view.
+
+    Only carries the user's bearer token (so RLS applies); all connections come from the shared pool.
+    Exposes the `table`, `from_` and `rpc` API; `execute()` is awaitable so queries never block the event loop.
+    """
+
+    def __init__(self, pool: "SupabasePool", access_token: str):
+        self._pool = pool
+        super().__init__(
+            pool.rest_url,
+            headers={
+                **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                "apikey": settings.supabase_anon_key,
+                "Authorization": f"Bearer {access_token}",
+            },
+        )
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> _UserSession:
+        return _UserSession(self._pool.http_client, headers)
+
+
+class SupabasePool:
+    """Owns the pooled async http client and a stateless GoTrue client for the whole process."""
+
+    def __init__(self):
+        self.rest_url = f"{settings.supabase_url}/rest/v1"
+        self.http_client = AsyncClient(
+            base_url=self.rest_url,
+            timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT,
+            limits=Limits(
+                max_connections=settings.supabase_pool_max_connections,
+                max_keepalive_connections=settings.supabase_pool_max_keepalive,
+                keepalive_expiry=settings.supabase_pool_keepalive_expiry,
+            ),
+            follow_redirects=True,
+            http2=True,
+        )
+        # The token is always passed explicitly to get_user, so no session is stored here
+        self.auth = AsyncGoTrueClient(
+            url=f"{settings.supabase_url}/auth/v1",
+            headers={
+                "apikey": settings.supabase_anon_key,
+                "Authorization": f"Bearer {settings.supabase_anon_key}",
+            },
+            http_client=self.http_client,
+            auto_refresh_token=False,
+            persist_session=False,
+        )
+
+    def for_user(self, access_token: str) -> UserSupabaseClient:
+        return UserSupabaseClient(self, access_token)
+
+    def service_client(self) -> Optional[UserSupabaseClient]:
+        """Client authenticated with the service-role key (bypasses RLS), or None when it is not configured."""
+        if not settings.supabase_service_role_key:
+            return None
+        return self.for_user(settings.supabase_service_role_key)
+
+    async def close(self) -> None:
+        await self.http_client.aclose()
+
+
+_pool: Optional[SupabasePool] = None
+
+
+def init_supabase_pool() -> SupabasePool:
+    """Create the shared pool. Called from the FastAPI lifespan."""
+    global _pool
+    if _pool is None:
+        _pool = SupabasePool()
+    return _pool
+
+
+async def close_supabase_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_supabase_pool() -> SupabasePool:
+    """Return the shared pool, creating it lazily when the app lifespan did not run (scripts, tests)."""
+    return _pool or init_supabase_pool()
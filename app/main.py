@@ -1,12 +1,40 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api.v1 import api_router as api_v1
 from app.api.v2 import api_router as api_v2
 from app.core.config import settings
+from app.core.db import init_supabase_pool, close_supabase_pool
+from app.core.metrics import render_metrics
+from app.api.deps import auth_user_cache_stats
+from app.services import user_settings_cache_stats
+from app.services.llm_cache import llm_cache_stats
+from app.services.dialog_context import load_encoding
+from app.services.job_queue import job_queue
+from app.services.inventory import inventory_replenisher
 from fastapi.middleware.cors import CORSMiddleware
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_supabase_pool()
+    # Warm the tokenizer for dialog context budgets without delaying startup
+    encoding_task = asyncio.create_task(load_encoding(settings.openrouter_model_name))
+    await job_queue.start()
+    inventory_replenisher.start()
+    yield
+    await inventory_replenisher.stop()
+    await job_queue.stop()
+    encoding_task.cancel()
+    await close_supabase_pool()
+
+
 app = FastAPI(
     title=settings.project_name,
-    openapi_url=f"{settings.api_v1_str}/openapi.json"
+    openapi_url=f"{settings.api_v1_str}/openapi.json",
+    lifespan=lifespan
 )
 # WARNING: This configuration is insecure and should only be used for testing.
 # It allows requests from any origin.
@@ -16,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API router
@@ -28,4 +57,17 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "caches": {
+            "auth_user": auth_user_cache_stats(),
+            "user_settings": user_settings_cache_stats(),
+            "llm_response": llm_cache_stats()
+        }
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """LLM call and article inventory metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -15,6 +15,18 @@ class ProcessedArticleResponse(BaseModel):
     dialogue_starter_question_translation: str
     metadata: Dict[str, Any]
 
+class BatchAdaptationTarget(BaseModel):
+    targetLanguage: str
+    targetLevel: str
+    translationLanguage: str
+
+class BatchAdaptedArticle(ProcessedArticleResponse):
+    language: str
+    level: str
+
+class BatchAdaptationResponse(BaseModel):
+    adaptations: List[BatchAdaptedArticle]
+
 class SimpleArticleGenerationRequest(BaseModel):
     categories: List[str]
 
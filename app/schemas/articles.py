@@ -1,7 +1,16 @@
 from datetime import datetime
 
 from pydantic import BaseModel, Json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from uuid import UUID
+
+class ArticleResponse(BaseModel):
+    title: str
+    content: str
+    category: str
+
+class ArticleListResponse(BaseModel):
+    articles: List[ArticleResponse]
 
 class AdaptedArticleCreate(BaseModel):
     original_article_id: int
@@ -34,4 +43,12 @@ class DiscoverArticleData(BaseModel):
     intro: str
     adapted_article_id: int
     dialogue_id: Optional[str] = None
-    created_at: Optional[datetime] = None
\ No newline at end of file
+    created_at: Optional[datetime] = None
+
+class GenerationJobStatus(BaseModel):
+    request_id: UUID
+    status: str
+    progress: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
\ No newline at end of file
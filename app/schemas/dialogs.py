@@ -14,6 +14,8 @@ class DialogResponse(BaseModel):
     dialogId: str
     article: AdaptedArticleData
     messages: List[Message]
+    # Pass to GET /dialogs/{dialogId}/messages to load older messages; None when there are none
+    olderMessagesCursor: Optional[str] = None
 
 class SendMessageRequest(BaseModel):
     message: str
@@ -36,11 +38,15 @@ class CoachResponse(BaseModel):
     text: str
     metadata: Dict[str, Any]
 
+class DialogSummaryLLMSchema(BaseModel):
+    summary: str
+
 class DialogFollowUpResponseLLMSchema(BaseModel):
+    # followUpQuestion first: it is streamed to the user while the rest is generated
+    followUpQuestion: str
+    followUpTranslation: str
     errorReview: Optional[str]
     correctedResponse: str
     grammarExplanation: Optional[str]
-    followUpQuestion: str
-    followUpTranslation: str
     followUpGrammarTopic: Optional[str] = None
     usedVocabulary: Dict[str, str]
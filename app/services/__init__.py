@@ -3,7 +3,8 @@ from app.services.user_settings import (
     get_user_settings,
     update_user_settings,
     delete_user_settings,
-    ensure_user_settings_exists
+    ensure_user_settings_exists,
+    user_settings_cache_stats
 )
 
 __all__ = [
@@ -11,5 +12,6 @@ __all__ = [
     "get_user_settings", 
     "update_user_settings",
     "delete_user_settings",
-    "ensure_user_settings_exists"
+    "ensure_user_settings_exists",
+    "user_settings_cache_stats"
 ]
\ No newline at end of file
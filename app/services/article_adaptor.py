@@ -1,19 +1,62 @@
-from typing import Any, Coroutine
+import asyncio
+import json
+import logging
+import math
+from typing import Any, Coroutine, Dict, List, Optional, Sequence, Tuple
 
+from app.core.config import settings
 from app.services.llmclient import callLLM
-from app.services.prompt_service import PromptService
-from supabase import Client
+from app.services.prompt_registry import ARTICLE_ADAPTATION, ARTICLE_BATCH_ADAPTATION
+from supabase import AsyncClient
 import httpx
 from app.schemas.articles import AdaptedArticleData, AdaptedArticleCreate
-from app.schemas.admin import ProcessedArticleResponse
+from app.schemas.admin import BatchAdaptationResponse, BatchAdaptationTarget, ProcessedArticleResponse
 
-async def _save_adapted_article(article_data: AdaptedArticleCreate, supabase: Client) -> AdaptedArticleData:
+logger = logging.getLogger(__name__)
+
+# (target_lang, language_level, initial_lang) of one adaptation in a batch
+AdaptationTarget = Tuple[str, str, str]
+
+# (original_article_id, language, level) -> in-flight adaptation shared by all concurrent callers
+_in_flight: Dict[Tuple[int, str, str], "asyncio.Task[AdaptedArticleData]"] = {}
+
+
+async def _find_adapted_article(
+    article_id: int, target_lang: str, language_level: str, supabase: AsyncClient
+) -> Optional[AdaptedArticleData]:
+    """Returns an existing adaptation of the article into the same language and level, if any."""
+    response = await supabase.table("adapted_articles") \
+        .select("*") \
+        .eq("original_article_id", article_id) \
+        .eq("language", target_lang) \
+        .eq("level", language_level) \
+        .limit(1) \
+        .execute()
+    if not response.data:
+        return None
+    return AdaptedArticleData.model_validate(response.data[0])
+
+
+async def _save_adapted_article(
+    article_data: AdaptedArticleCreate, supabase: AsyncClient, overwrite: bool = False
+) -> AdaptedArticleData:
     """
     Saves the adapted article to the database.
+    If another process saved the same (article, language, level) first, that row is returned instead,
+    unless overwrite is set: then the row keeps its id and gets the new content.
     """
     # Pydantic's model_dump_json handles the serialization correctly
-    response = supabase.table("adapted_articles").insert(article_data.model_dump(mode='json')).execute()
+    response = await supabase.table("adapted_articles").upsert(
+        article_data.model_dump(mode='json'),
+        on_conflict="original_article_id,language,level",
+        ignore_duplicates=not overwrite
+    ).execute()
     if not response.data:
+        existing = await _find_adapted_article(
+            article_data.original_article_id, article_data.language, article_data.level, supabase
+        )
+        if existing:
+            return existing
         raise httpx.HTTPStatusError("Failed to save adapted article", request=None, response=httpx.Response(500))
     #we need to return the adapted article data
     adapted_article = AdaptedArticleData.model_validate(response.data[0])
@@ -24,23 +67,220 @@ async def adapt_article(
     language_level: str,
     initial_lang: str,
     target_lang: str,
-    supabase: Client
+    supabase: AsyncClient,
+    use_cache: bool = True
 ) -> AdaptedArticleData:
     """
-    Adapts an article and saves it to the database.
+    Returns the adaptation of an article for the language/level, creating it only if it doesn't exist yet.
+    Concurrent callers asking for the same adaptation share one LLM call, and a previous LLM answer for
+    the same article and target is reused from the LLM response cache.
+
+    With use_cache False the article is adapted again without the LLM response cache, and the new
+    answer overwrites the stored adaptation.
     """
+    if not use_cache:
+        return await _adapt_and_save(article_id, language_level, initial_lang, target_lang, supabase, use_cache)
+
+    existing = await _find_adapted_article(article_id, target_lang, language_level, supabase)
+    if existing:
+        return existing
+
+    key = (article_id, target_lang, language_level)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _adapt_and_save(article_id, language_level, initial_lang, target_lang, supabase, use_cache)
+        )
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: one caller going away must not cancel the adaptation the others are waiting for
+    return await asyncio.shield(task)
+
+
+async def _get_article_text(article_id: int, supabase: AsyncClient) -> str:
     # Fetch article from Supabase
-    response = supabase.table("articles").select("original_text", "category").eq("id", article_id).single().execute()
+    response = await supabase.table("articles").select("original_text", "category").eq("id", article_id).single().execute()
 
     if not response.data:
         raise httpx.HTTPStatusError(f"Article with id {article_id} not found", request=None, response=httpx.Response(404))
 
-    article_data = response.data
-    article_text = article_data.get("original_text")
+    article_text = response.data.get("original_text")
     #replace double quotes with single quotes to avoid issues with JSON parsing
-    article_text = article_text.replace('"', "'")
+    return article_text.replace('"', "'")
+
+
+async def _find_adaptations(article_id: int, supabase: AsyncClient) -> Dict[Tuple[str, str], AdaptedArticleData]:
+    """All existing adaptations of an article, by (language, level)."""
+    response = await supabase.table("adapted_articles") \
+        .select("*") \
+        .eq("original_article_id", article_id) \
+        .execute()
+    return {
+        (row["language"], row["level"]): AdaptedArticleData.model_validate(row)
+        for row in response.data or []
+    }
+
+
+async def _adapt_batch(
+    article_id: int, article_text: str, targets: Sequence[AdaptationTarget], use_cache: bool
+) -> List[AdaptedArticleCreate]:
+    """One LLM call adapting the article into every target; targets missing from the answer are dropped."""
+    target_inputs = [
+        BatchAdaptationTarget(targetLanguage=target_lang, targetLevel=level, translationLanguage=initial_lang).model_dump()
+        for target_lang, level, initial_lang in targets
+    ]
+    response = await callLLM(
+        prompt_template_str=ARTICLE_BATCH_ADAPTATION,
+        prompt_args={
+            "article": article_text,
+            "size_limit": 250,
+            "targets": json.dumps(target_inputs, ensure_ascii=False),
+        },
+        output_schema=BatchAdaptationResponse,
+        use_cache=use_cache
+    )
+
+    wanted = {(target_lang, level) for target_lang, level, _ in targets}
+    adaptations = {}
+    for adaptation in response.adaptations:
+        key = (adaptation.language.strip(), adaptation.level.strip())
+        if key in wanted:
+            adaptations.setdefault(key, AdaptedArticleCreate(
+                original_article_id=article_id,
+                language=key[0],
+                level=key[1],
+                title=adaptation.title,
+                thumbnail_url=None,
+                intro=adaptation.intro,
+                adapted_text=adaptation.adapted_text,
+                metadata=adaptation.metadata,
+                dialogue_starter_question=adaptation.dialogue_starter_question,
+                dialogue_starter_question_translation=adaptation.dialogue_starter_question_translation
+            ))
+    return list(adaptations.values())
+
+
+def split_batches(targets: Sequence[AdaptationTarget], batch_size: int) -> List[List[AdaptationTarget]]:
+    """As few batches of at most batch_size targets as possible, with sizes differing by at most one."""
+    count = math.ceil(len(targets) / max(batch_size, 1))
+    return [list(targets[i::count]) for i in range(count)]
+
+
+async def adapt_article_batch(
+    article_id: int,
+    targets: Sequence[AdaptationTarget],
+    supabase: AsyncClient,
+    use_cache: bool = True
+) -> List[AdaptedArticleData]:
+    """
+    Returns the adaptations of an article for every (target_lang, language_level, initial_lang) target,
+    in the order of the targets.
+
+    Missing adaptations are produced adaptation_batch_size targets per LLM call, so the source text is sent
+    once per batch instead of once per target, and saved with one bulk insert. A single missing target, and
+    targets an answer leaves out, go through the single-target prompt. Every batched target is registered in
+    _in_flight like adapt_article does, and targets already in flight are awaited instead of adapted again.
+    With use_cache False every target is adapted again, as adapt_article does, overwriting what is stored.
+    """
+    existing = await _find_adaptations(article_id, supabase) if use_cache else {}
+    missing = list({
+        (target_lang, level): (target_lang, level, initial_lang)
+        for target_lang, level, initial_lang in targets
+        if (target_lang, level) not in existing
+    }.values())
+
+    tasks: Dict[Tuple[str, str], "asyncio.Task[AdaptedArticleData]"] = {}
+    to_adapt = []
+    for target_lang, level, initial_lang in missing:
+        task = _in_flight.get((article_id, target_lang, level)) if use_cache else None
+        if task is None:
+            to_adapt.append((target_lang, level, initial_lang))
+        else:
+            tasks[(target_lang, level)] = task
+
+    # A single target is cheaper with the single-target prompt
+    if len(to_adapt) == 1:
+        target_lang, level, initial_lang = to_adapt[0]
+        tasks[(target_lang, level)] = asyncio.ensure_future(
+            adapt_article(article_id, level, initial_lang, target_lang, supabase, use_cache)
+        )
+    elif to_adapt:
+        # no await between the _in_flight lookups above and the registrations below
+        article_text = asyncio.create_task(_get_article_text(article_id, supabase))
+        for batch in split_batches(to_adapt, settings.adaptation_batch_size):
+            batch_task = asyncio.create_task(_adapt_and_save_batch(article_id, article_text, batch, supabase, use_cache))
+            for target_lang, level, initial_lang in batch:
+                key = (article_id, target_lang, level)
+                task = asyncio.create_task(
+                    _batch_target(batch_task, article_id, level, initial_lang, target_lang, supabase, use_cache)
+                )
+                if use_cache:
+                    _in_flight[key] = task
+                    task.add_done_callback(lambda _, key=key: _in_flight.pop(key, None))
+                tasks[(target_lang, level)] = task
+
+    for (target_lang, level), task in tasks.items():
+        # shield: one caller going away must not cancel the adaptation the others are waiting for
+        existing[(target_lang, level)] = await asyncio.shield(task)
+
+    return [existing[(target_lang, level)] for target_lang, level, _ in targets]
+
+
+async def _adapt_and_save_batch(
+    article_id: int,
+    article_text: "asyncio.Task[str]",
+    targets: Sequence[AdaptationTarget],
+    supabase: AsyncClient,
+    use_cache: bool
+) -> Dict[Tuple[str, str], AdaptedArticleData]:
+    """Adapts the article into a batch of targets and saves the answer; returns {} if the batch failed."""
+    try:
+        adaptations = await _adapt_batch(article_id, await article_text, targets, use_cache)
+        if not adaptations:
+            return {}
+        # Adaptations saved concurrently by someone else win unless use_cache is False; the re-read below
+        # returns the stored rows
+        await supabase.table("adapted_articles").upsert(
+            [adaptation.model_dump(mode='json') for adaptation in adaptations],
+            on_conflict="original_article_id,language,level",
+            ignore_duplicates=use_cache
+        ).execute()
+        adapted = {(adaptation.language, adaptation.level) for adaptation in adaptations}
+        return {key: row for key, row in (await _find_adaptations(article_id, supabase)).items() if key in adapted}
+    except Exception as e:
+        logger.warning(f"Batch adaptation of article {article_id} into {list(targets)} failed: {e}")
+        return {}
+
+
+async def _batch_target(
+    batch_task: "asyncio.Task[Dict[Tuple[str, str], AdaptedArticleData]]",
+    article_id: int,
+    language_level: str,
+    initial_lang: str,
+    target_lang: str,
+    supabase: AsyncClient,
+    use_cache: bool
+) -> AdaptedArticleData:
+    """One target of a batch; adapted on its own if the batch answer left it out."""
+    adapted = (await batch_task).get((target_lang, language_level))
+    if adapted is None:
+        adapted = await _adapt_and_save(article_id, language_level, initial_lang, target_lang, supabase, use_cache)
+    return adapted
+
+
+async def _adapt_and_save(
+    article_id: int,
+    language_level: str,
+    initial_lang: str,
+    target_lang: str,
+    supabase: AsyncClient,
+    use_cache: bool = True
+) -> AdaptedArticleData:
+    """
+    Adapts an article and saves it to the database.
+    """
+    article_text = await _get_article_text(article_id, supabase)
 
-    prompt_template = PromptService.get_article_adaptation_prompt()
     prompt_args = {
         "lang_level": language_level,
         "learning_language": target_lang,
@@ -50,9 +290,10 @@ async def adapt_article(
     }
 
     processed_article = await callLLM(
-        prompt_template_str=prompt_template,
+        prompt_template_str=ARTICLE_ADAPTATION,
         prompt_args=prompt_args,
-        output_schema=ProcessedArticleResponse
+        output_schema=ProcessedArticleResponse,
+        use_cache=use_cache
     )
 
     # The metadata from the LLM is a dict. We need to convert it to a JSON string.
@@ -69,6 +310,6 @@ async def adapt_article(
         dialogue_starter_question_translation=processed_article.dialogue_starter_question_translation
     )
 
-    saved_article=await _save_adapted_article(adapted_article_data, supabase)
+    saved_article=await _save_adapted_article(adapted_article_data, supabase, overwrite=not use_cache)
 
     return saved_article
@@ -1,45 +1,40 @@
+import hashlib
+import re
+from datetime import datetime
 from typing import List
 
-from app.services import prompt_service
+from app.core.config import settings
+from app.schemas.articles import ArticleListResponse, ArticleResponse
+from app.services import near_duplicates
 from app.services.llmclient import callLLM
-from pydantic import BaseModel
-from app.services.prompt_service import PromptService
+from app.services.prompt_registry import ARTICLE_BATCH_CREATION, ARTICLE_CREATION
 
-class ArticleResponse(BaseModel):
-    title: str
-    content: str
-    category: str
+
+def content_hash(content: str, date: str) -> str:
+    """
+    Hash of the article text ignoring case, punctuation and spacing, salted with the day it was stored,
+    so the same article produced twice on one day is stored once.
+    """
+    normalised = " ".join(re.findall(r"\w+", content.lower()))
+    return hashlib.sha256(f"{date}\n{normalised}".encode()).hexdigest()
 
 
 class SimpleArticleService:
-    async def generate_articles_for_categories(
-            self,
-            categories: List[str],
-            user_id: str,
-            supabase_client,
-            limit: int = 3
-    ) -> List[int]:
-        """Generate 3 articles per category using existing LLM setup."""
-        article_ids = []
-
-        for category in categories:
-            # Generate 3 articles per category
-            for i in range(limit):
-                article = await self.generate_single_article(category, i + 1)
-                article_id = await self.store_article(article, user_id, supabase_client)
-                article_ids.append(article_id)
-
-        return article_ids
+    async def generate_and_store_articles(self, category: str, count: int, user_id: str, supabase_client) -> List[int]:
+        """
+        Generate `count` distinct articles of a category in batches and store them with one bulk insert.
+        Returns the ids of the stored articles; duplicates are dropped, so there may be fewer than `count`.
+        """
+        articles = await self.generate_articles(category, count)
+        return await self.store_articles(articles, user_id, supabase_client)
 
     async def generate_single_article(self, category: str, sequence: int) -> dict:
         """Generate one article using existing LLM client."""
-        prompt = PromptService.get_article_creation_prompt()
         #get current date
-        from datetime import datetime
         date = datetime.now().strftime("%Y-%m-%d")
 
         response = await callLLM(
-            prompt_template_str=prompt,
+            prompt_template_str=ARTICLE_CREATION,
             prompt_args={"category": category, "date": date },
             output_schema=ArticleResponse,
             extended_model=True
@@ -47,13 +42,75 @@ class SimpleArticleService:
 
         return response.dict()
 
-    async def store_article(self, article: dict, user_id: str, supabase_client) -> int:
-        """Store article in database."""
-        result = supabase_client.table("articles").insert({
-            "title": article["title"],
-            "original_text": article["content"],
-            "category": article["category"],
-            "user_id": user_id
-        }).execute()
+    async def generate_articles(self, category: str, count: int) -> List[dict]:
+        """
+        Generate `count` articles of a category, article_generation_batch_size per extended-model call, so
+        the web search for the category and date is shared by the articles of a call.
+
+        The calls run one after another, each given the titles of the articles generated so far, so later
+        batches pick other stories instead of repeating the same ones.
+        """
+        if count == 1:
+            return [await self.generate_single_article(category, 1)]
+
+        date = datetime.now().strftime("%Y-%m-%d")
+        batch_size = max(settings.article_generation_batch_size, 1)
+        articles = []
+        for start in range(0, count, batch_size):
+            batch = min(batch_size, count - start)
+            titles = "\n".join(f"- {article['title']}" for article in articles)
+            response = await callLLM(
+                prompt_template_str=ARTICLE_BATCH_CREATION,
+                prompt_args={"category": category, "date": date, "count": batch, "exclude_titles": titles or "none"},
+                output_schema=ArticleListResponse,
+                extended_model=True
+            )
+            articles.extend(article.dict() for article in response.articles[:batch])
+        return articles
+
+    async def store_articles(self, articles: List[dict], user_id: str, supabase_client) -> List[int]:
+        """
+        Store articles with one bulk insert, returning their ids in order.
+
+        Articles near-duplicating a stored article of their category (see near_duplicates) or an earlier
+        article of the batch are skipped. An article whose content hash is already stored today is not
+        inserted again; the id of the stored copy is returned instead, once.
+        """
+        date = datetime.now().strftime("%Y-%m-%d")
+        rows = {}
+        signatures = {}
+        batch_index = near_duplicates.NearDuplicateIndex(settings.near_duplicate_threshold)
+        for article in articles:
+            article_hash = content_hash(article["content"], date)
+            if article_hash in rows:
+                continue
+            sig = near_duplicates.signature(article["content"])
+            category_index = await near_duplicates.get_category_index(supabase_client, article["category"])
+            if category_index.find_duplicate(sig) is not None or batch_index.find_duplicate(sig) is not None:
+                continue
+            batch_index.add(len(rows), sig)
+            signatures[article_hash] = sig
+            rows[article_hash] = {
+                "title": article["title"],
+                "original_text": article["content"],
+                "category": article["category"],
+                "user_id": user_id,
+                "content_hash": article_hash,
+                "minhash": near_duplicates.encode_signature(sig)
+            }
+        if not rows:
+            return []
 
-        return result.data[0]["id"]
\ No newline at end of file
+        await supabase_client.table("articles").upsert(
+            list(rows.values()),
+            on_conflict="content_hash",
+            ignore_duplicates=True
+        ).execute()
+        result = await supabase_client.table("articles") \
+            .select("id, content_hash") \
+            .in_("content_hash", list(rows)) \
+            .execute()
+        ids = {row["content_hash"]: row["id"] for row in result.data or []}
+        for article_hash, article_id in ids.items():
+            near_duplicates.add_article(rows[article_hash]["category"], article_id, signatures[article_hash])
+        return [ids[article_hash] for article_hash in rows if article_hash in ids]
@@ -1,12 +1,12 @@
 import json
 from typing import List, Optional
-from supabase import Client
+from supabase import AsyncClient
 from app.schemas.articles import AdaptedArticleData, DiscoverArticleData
 from app.services import get_user_settings
 
 
 async def get_articles(
-    supabase: Client,
+    supabase: AsyncClient,
     categories: Optional[List[str]] = None,
     language: Optional[str] = None,
     level: Optional[str] = None,
@@ -40,7 +40,7 @@ async def get_articles(
         query = query.in_("category", categories)
     
     # Execute query with limit
-    response = query.limit(limit).execute()
+    response = await query.limit(limit).execute()
     
     # Transform results to ArticleListItem format
     articles = []
@@ -62,7 +62,7 @@ async def get_articles(
     return articles
 
 # add method to get article by id
-async def get_article_by_id(supabase: Client, article_id: int) -> Optional[AdaptedArticleData]:
+async def get_article_by_id(supabase: AsyncClient, article_id: int) -> Optional[AdaptedArticleData]:
     """
     Fetch a single article by its ID.
 
@@ -74,7 +74,7 @@ async def get_article_by_id(supabase: Client, article_id: int) -> Optional[Adapt
         ArticleListItem object or None if not found
     """
 
-    response = supabase.table("adapted_articles").select(
+    response = await supabase.table("adapted_articles").select(
         "id, original_article_id, language, level, title, thumbnail_url, intro, adapted_text, metadata, dialogue_starter_question, dialogue_starter_question_translation"
     ).eq("id", article_id).single().execute()
 
@@ -99,7 +99,7 @@ async def get_article_by_id(supabase: Client, article_id: int) -> Optional[Adapt
 
 from app.services.dialogs import get_all_dialogs
 async def get_discover_articles(
-    supabase: Client,
+    supabase: AsyncClient,
     user_id: Optional[str] = None,
 ) -> List[DiscoverArticleData]:
     """
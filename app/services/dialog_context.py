@@ -0,0 +1,97 @@
+"""Bounded dialog context: a rolling summary of older messages plus the most recent ones, within a token budget."""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import tiktoken
+
+from app.core.config import settings
+from app.schemas.dialogs import SimpleMessage
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SENDER = "Summary of the earlier conversation"
+
+
+# model name -> encoding, or None when it could not be loaded (tokens are then estimated)
+_encodings: Dict[str, Optional[tiktoken.Encoding]] = {}
+
+
+def _load_encoding(model_name: str) -> Optional[tiktoken.Encoding]:
+    """
+    tiktoken encoding for an OpenRouter model name ("vendor/model"), cl100k_base if unknown. tiktoken downloads
+    an encoding on first use, which fails offline; that must not fail the request.
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name.split("/")[-1])
+    except Exception as e:
+        logger.info(f"No tiktoken encoding for {model_name}, trying cl100k_base: {e}")
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+async def load_encoding(model_name: str) -> None:
+    """Load (or fail to load) the model's encoding once, off the event loop."""
+    if model_name not in _encodings:
+        _encodings[model_name] = await asyncio.to_thread(_load_encoding, model_name)
+
+
+def _get_encoding(model_name: str) -> Optional[tiktoken.Encoding]:
+    # Loads synchronously if load_encoding was not awaited first (scripts, benchmarks)
+    if model_name not in _encodings:
+        _encodings[model_name] = _load_encoding(model_name)
+    return _encodings[model_name]
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str) -> str:
+    """Cuts text to at most max_tokens tokens."""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def build_history(
+    summary: Optional[str], messages: List[SimpleMessage], model_name: str
+) -> List[SimpleMessage]:
+    """
+    History sent to the LLM: the summary (if any) followed by the newest not-yet-summarised
+    messages that fit into settings.dialog_history_token_budget. The newest message is always kept.
+    """
+    budget = settings.dialog_history_token_budget
+    if summary:
+        budget -= count_tokens(summary, model_name)
+
+    recent: List[SimpleMessage] = []
+    for message in reversed(messages):
+        budget -= count_tokens(message.text, model_name)
+        if budget < 0 and recent:
+            break
+        recent.append(message)
+    recent.reverse()
+
+    if summary:
+        return [SimpleMessage(sender=SUMMARY_SENDER, text=summary)] + recent
+    return recent
+
+
+def messages_to_summarise(unsummarised_count: int) -> int:
+    """
+    How many of the oldest unsummarised messages should be folded into the summary now.
+    Folding happens in batches so that the summary is refreshed only every few turns.
+    """
+    keep = settings.dialog_recent_messages
+    if unsummarised_count < keep + settings.dialog_summary_batch:
+        return 0
+    return unsummarised_count - keep
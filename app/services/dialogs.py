@@ -1,10 +1,37 @@
-from typing import List
+import asyncio
+import base64
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from supabase import Client
-from app.schemas.dialogs import DialogResponse, SendMessageRequest, Message
+from supabase import AsyncClient
+from app.schemas.dialogs import (
+    DialogResponse,
+    SendMessageRequest,
+    Message,
+    SimpleMessage,
+    DialogFollowUPRequestLLMSchema,
+    DialogFollowUpResponseLLMSchema,
+    DialogSummaryLLMSchema
+)
+from app.core.config import settings as app_settings
 from app.services.articles import get_article_by_id
-from app.services.prompt_service import PromptService
-from app.services.user_settings import get_user_settings
+from app.services.dialog_context import build_history, load_encoding, messages_to_summarise, truncate_to_tokens
+from app.services.prompt_registry import CompiledPrompt, DIALOG_FOLLOW_UP, DIALOG_SUMMARY
+from app.services.llmclient import LLM_TIME_TO_FIRST_TOKEN, callLLM, streamLLM
+
+logger = logging.getLogger(__name__)
+
+AI_ERROR_TEXT = "I encountered an error. Please try again."
+
+# Only the columns format_messages needs
+MESSAGE_COLUMNS = "id, speaker, content, created_at"
+
+# Background summary updates; references are kept so the tasks are not garbage-collected mid-flight
+_summary_tasks: Set["asyncio.Task[None]"] = set()
 
 
 def format_messages(raw: list[dict]) -> List[Message]:
@@ -21,23 +48,60 @@ def format_messages(raw: list[dict]) -> List[Message]:
     return messages
 
 
-async def get_or_create_dialog(supabase: Client, user_id: str, adapted_article_id: int) -> DialogResponse:
-    # First, try to find an existing dialognew_dialog_response
-    existing_dialog_response = supabase.table("dialogues") \
-        .select("*, adapted_articles(*), messages(*)") \
+def encode_messages_cursor(created_at: str, message_id: Any) -> str:
+    """Opaque keyset cursor pointing just before (older than) the given message."""
+    raw = json.dumps([created_at, message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_messages_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Inverse of encode_messages_cursor. Raises ValueError for malformed cursors. The message id must be an
+    integer or a UUID, as it ends up in a PostgREST filter.
+    """
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(message_id, int) and not isinstance(message_id, bool):
+            message_id = str(message_id)
+        else:
+            message_id = str(uuid.UUID(message_id))
+        return datetime.fromisoformat(created_at).isoformat(), message_id
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _messages_page(rows: List[dict], limit: int) -> Tuple[List[Message], Optional[str]]:
+    """Rows fetched newest first -> messages in chronological order plus the cursor of the older page."""
+    rows = list(reversed(rows))
+    older_cursor = encode_messages_cursor(rows[0]["created_at"], rows[0]["id"]) if len(rows) == limit else None
+    return format_messages(rows), older_cursor
+
+
+async def get_or_create_dialog(supabase: AsyncClient, user_id: str, adapted_article_id: int) -> DialogResponse:
+    # First, try to find an existing dialog with only its newest page of messages,
+    # ordered and limited in the database (index on messages(dialogue_id, created_at, id))
+    page_size = app_settings.dialog_messages_page_size
+    existing_dialog_response = await supabase.table("dialogues") \
+        .select(f"id, adapted_articles(*), messages({MESSAGE_COLUMNS})") \
         .eq("user_id", user_id) \
-        .eq("adapted_article_id", adapted_article_id).maybe_single().execute() \
+        .eq("adapted_article_id", adapted_article_id) \
+        .order("created_at", desc=True, foreign_table="messages") \
+        .order("id", desc=True, foreign_table="messages") \
+        .limit(page_size, foreign_table="messages") \
+        .maybe_single().execute()
 
     if existing_dialog_response and existing_dialog_response.data:
         dialog_data = existing_dialog_response.data
+        messages, older_cursor = _messages_page(dialog_data['messages'], page_size)
         return DialogResponse(
             dialogId=dialog_data['id'],
             article=dialog_data['adapted_articles'],
-            messages=format_messages(dialog_data['messages'])
+            messages=messages,
+            olderMessagesCursor=older_cursor
         )
 
     # If no dialog exists, create a new one
-    new_dialog_response = supabase.table("dialogues") \
+    new_dialog_response = await supabase.table("dialogues") \
         .insert({"user_id": user_id, "adapted_article_id": adapted_article_id}) \
         .execute()
 
@@ -58,9 +122,41 @@ async def get_or_create_dialog(supabase: Client, user_id: str, adapted_article_i
         messages= []
     )
 
-async def get_all_dialogs(supabase: Client, user_id: str) -> List[DialogResponse]:
+async def get_dialog_messages_page(
+    supabase: AsyncClient, dialog_id: str, user_id: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Message], Optional[str]]:
+    """
+    Get a page of a dialog's messages in chronological order, plus the cursor of the next older page
+    (None when this page reaches the start of the dialog).
+
+    Without `cursor` the newest messages are returned; with it, the messages right before that one
+    (keyset pagination on (created_at, id)).
+    """
+    # The inner join on dialogues restricts the messages to a dialog owned by the user
+    query = supabase.table("messages") \
+        .select(f"{MESSAGE_COLUMNS}, dialogues!inner(user_id)") \
+        .eq("dialogue_id", dialog_id) \
+        .eq("dialogues.user_id", user_id)
+
+    if cursor:
+        created_at, message_id = decode_messages_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{message_id})'
+        )
+
+    response = await query.order("created_at", desc=True) \
+        .order("id", desc=True) \
+        .limit(limit).execute()
+
+    if not response.data:
+        return [], None
+    return _messages_page(response.data, limit)
+
+
+async def get_all_dialogs(supabase: AsyncClient, user_id: str) -> List[DialogResponse]:
     # Fetch all dialogs for the user
-    dialogs_response = supabase.table("dialogues") \
+    dialogs_response = await supabase.table("dialogues") \
         .select("*, adapted_articles(*)") \
         .eq("user_id", user_id) \
         .execute()
@@ -78,9 +174,8 @@ async def get_all_dialogs(supabase: Client, user_id: str) -> List[DialogResponse
 
     return dialogs
 
-async def add_message_to_dialog(supabase: Client, dialog_id: str, user_id: str, message: SendMessageRequest) -> Message:
-    # Save user message
-    user_message_response = supabase.table("messages") \
+async def _save_user_message(supabase: AsyncClient, dialog_id: str, message: SendMessageRequest) -> None:
+    user_message_response = await supabase.table("messages") \
         .insert({
             "dialogue_id": dialog_id,
             "speaker": "User",
@@ -91,84 +186,105 @@ async def add_message_to_dialog(supabase: Client, dialog_id: str, user_id: str,
     if not user_message_response.data:
         raise Exception("Failed to save user message")
 
-    # Fetch dialog context (adapted_article_text and messages from whole dialog)
-    dialogs_data = supabase.table("dialogues").select("id, adapted_article_id").eq("id", dialog_id).single().execute()
-    if not dialogs_data.data:
+
+async def _prepare_follow_up(supabase: AsyncClient, dialog_id: str, user_id: str, message: SendMessageRequest) -> Tuple[CompiledPrompt, Dict[str, Any], Dict[str, Any]]:
+    """
+    Builds the follow-up prompt and its arguments from the dialog context (does not save the user message).
+    Also returns the raw context, which is needed to update the rolling summary after the reply is saved.
+    """
+    # One round-trip for the dialog (owned by the user), article text, summary, unsummarised history and user settings
+    context_response = await supabase.rpc(
+        "get_dialog_context", {"p_dialog_id": dialog_id, "p_user_id": user_id}
+    ).execute()
+    context = context_response.data
+    if not context:
         raise Exception("Dialog not found")
-    
-    adapted_article_id = dialogs_data.data["adapted_article_id"]
-    
-    # Get adapted article text and metadata
-    adapted_article = supabase.table("adapted_articles").select("id, adapted_text").eq("id", adapted_article_id).single().execute()
-    if not adapted_article.data:
-        raise Exception("Adapted article not found")
-    
-    adapted_article_data = adapted_article.data
-    adapted_text = adapted_article_data["adapted_text"]
+    if not context.get("settings"):
+        raise Exception("User settings not found")
 
     # Extract vocabulary and grammar from article metadata
     vocabulary = []
     grammar_topics = []
-    
-    # Get all messages in the dialog
-    messages_response = supabase.table("messages").select("*").eq("dialogue_id", dialog_id).execute()
-    messages = messages_response.data
-    messages_sorted = sorted(messages, key=lambda x: x['created_at'])
-
-    # Build conversation history for LLM
-    from app.schemas.dialogs import SimpleMessage
-    history = []
-    for msg in messages_sorted:
-        history.append(SimpleMessage(
-            sender=msg['speaker'],
-            text=msg['content']['text']
-        ))
 
+    # Build conversation history for LLM; the new user message is saved concurrently with the LLM call.
+    # Older messages are represented by the rolling summary, so the prompt stays bounded for long dialogs.
+    model_name = app_settings.openrouter_model_name
+    await load_encoding(model_name)
+    history = [SimpleMessage(sender=msg["speaker"], text=msg["text"]) for msg in context["messages"]]
+    history.append(SimpleMessage(sender="User", text=message.message))
+    history = build_history(context.get("summary"), history, model_name)
 
     # Get prompt template
 
-    prompt_template = PromptService.get_dialog_follow_up_prompt()
+    prompt_template = DIALOG_FOLLOW_UP
 
     # Prepare LLM request using schema
-    from app.schemas.dialogs import DialogFollowUPRequestLLMSchema
     llm_request = DialogFollowUPRequestLLMSchema(
-        article=adapted_text,
+        article=truncate_to_tokens(context["adapted_text"], app_settings.dialog_article_token_budget, model_name),
         dialogHistory=history,
         lastUserMessage=message.message,
         vocabulary=vocabulary,
         grammarTopics=grammar_topics
     )
 
-    #get user settings
-    settings = await get_user_settings(supabase, user_id)
+    user_settings = context["settings"]
     additional_args = {
-        "lang_level": settings.language_level,
-        "main_language": settings.main_language,
-        "learning_language": settings.learning_language,
+        "lang_level": user_settings["language_level"],
+        "main_language": user_settings["main_language"],
+        "learning_language": user_settings["learning_language"],
     }
 
-    # Call LLM
-    from app.services.llmclient import callLLM
-    from app.schemas.dialogs import DialogFollowUpResponseLLMSchema
+    return prompt_template, llm_request.dict() | additional_args, context
+
+
+def _schedule_summary_update(supabase: AsyncClient, dialog_id: str, context: Dict[str, Any], user_text: str, ai_text: str) -> None:
+    """Once enough messages have piled up, folds the oldest ones into dialogues.summary in the background."""
+    messages = context["messages"] + [
+        {"speaker": "User", "text": user_text},
+        {"speaker": "AI", "text": ai_text}
+    ]
+    count = messages_to_summarise(len(messages))
+    if not count:
+        return
+    task = asyncio.create_task(_update_summary(supabase, dialog_id, context, messages[:count]))
+    _summary_tasks.add(task)
+    task.add_done_callback(_summary_tasks.discard)
+
+
+async def _update_summary(supabase: AsyncClient, dialog_id: str, context: Dict[str, Any], messages: List[Dict[str, Any]]) -> None:
+    previous_count = context.get("summary_message_count") or 0
     try:
         llm_response = await callLLM(
-            prompt_template_str=prompt_template,
-            prompt_args=llm_request.dict() | additional_args,
-            output_schema=DialogFollowUpResponseLLMSchema
+            prompt_template_str=DIALOG_SUMMARY,
+            prompt_args={
+                "main_language": context["settings"]["main_language"],
+                "previousSummary": json.dumps(context.get("summary") or "", ensure_ascii=False),
+                "newMessages": json.dumps(messages, ensure_ascii=False)
+            },
+            output_schema=DialogSummaryLLMSchema
         )
-        ai_text = llm_response.followUpQuestion
+        # Guard on the old count: if a concurrent turn already folded these messages, this update is a no-op
+        await supabase.table("dialogues") \
+            .update({
+                "summary": llm_response.summary,
+                "summary_message_count": previous_count + len(messages)
+            }) \
+            .eq("id", dialog_id) \
+            .eq("summary_message_count", previous_count) \
+            .execute()
     except Exception as e:
-        # Fallback to placeholder on error
-        ai_text = "I encountered an error. Please try again."
+        logger.error(f"Failed to update summary of dialog {dialog_id}: {e}")
 
-    # Save actual AI response with metadata
-    ai_message_response = supabase.table("messages") \
+
+async def _save_ai_message(supabase: AsyncClient, dialog_id: str, ai_text: str, metadata: Dict[str, Any]) -> Message:
+    """Saves the AI response with its metadata and returns it as a Message."""
+    ai_message_response = await supabase.table("messages") \
         .insert({
             "dialogue_id": dialog_id,
             "speaker": "AI",
             "content": {
                 "text": ai_text,
-                "metadata": llm_response.dict()
+                "metadata": metadata
             }
         }) \
         .execute()
@@ -177,12 +293,91 @@ async def add_message_to_dialog(supabase: Client, dialog_id: str, user_id: str,
         raise Exception("Failed to save AI message")
 
     # create the message response
-    message = Message(
+    return Message(
         messageId=str(ai_message_response.data[0]['id']),
         sender="AI",
         text=ai_text,
-        metadata=llm_response.dict(),
+        metadata=metadata,
         timestamp=ai_message_response.data[0]['created_at']
     )
 
-    return message
\ No newline at end of file
+
+async def add_message_to_dialog(supabase: AsyncClient, dialog_id: str, user_id: str, message: SendMessageRequest) -> Message:
+    prompt_template, prompt_args, context = await _prepare_follow_up(supabase, dialog_id, user_id, message)
+    user_message_task = asyncio.create_task(_save_user_message(supabase, dialog_id, message))
+
+    # Call LLM
+    try:
+        llm_response = await callLLM(
+            prompt_template_str=prompt_template,
+            prompt_args=prompt_args,
+            output_schema=DialogFollowUpResponseLLMSchema
+        )
+        ai_text = llm_response.followUpQuestion
+        metadata = llm_response.dict()
+    except Exception as e:
+        # Fallback to placeholder on error
+        ai_text = AI_ERROR_TEXT
+        metadata = {}
+
+    await user_message_task
+    saved = await _save_ai_message(supabase, dialog_id, ai_text, metadata)
+    _schedule_summary_update(supabase, dialog_id, context, message.message, ai_text)
+    return saved
+
+
+async def stream_message_to_dialog(supabase: AsyncClient, dialog_id: str, user_id: str, message: SendMessageRequest) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of add_message_to_dialog.
+
+    The dialog context is fetched before this returns, so errors surface before the response starts;
+    the user message is saved while the reply streams. The returned iterator yields {"event": "token", "data": {"text": ...}} for every
+    new piece of followUpQuestion, then {"event": "message", "data": <Message>} once the AI message is
+    saved (same row as the non-streaming path).
+    """
+    prompt_template, prompt_args, context = await _prepare_follow_up(supabase, dialog_id, user_id, message)
+    user_message_task = asyncio.create_task(_save_user_message(supabase, dialog_id, message))
+    return _stream_follow_up(supabase, dialog_id, prompt_template, prompt_args, context, message.message, user_message_task)
+
+
+async def _stream_follow_up(
+    supabase: AsyncClient,
+    dialog_id: str,
+    prompt_template: CompiledPrompt,
+    prompt_args: Dict[str, Any],
+    context: Dict[str, Any],
+    user_text: str,
+    user_message_task: "asyncio.Task[None]"
+) -> AsyncIterator[Dict[str, Any]]:
+    sent = ""
+    llm_response = None
+    started = time.perf_counter()
+    try:
+        async for item in streamLLM(
+            prompt_template_str=prompt_template,
+            prompt_args=prompt_args,
+            output_schema=DialogFollowUpResponseLLMSchema
+        ):
+            if isinstance(item, DialogFollowUpResponseLLMSchema):
+                llm_response = item
+                continue
+            question = item.get("followUpQuestion")
+            if isinstance(question, str) and len(question) > len(sent) and question.startswith(sent):
+                if not sent:
+                    LLM_TIME_TO_FIRST_TOKEN.observe(
+                        time.perf_counter() - started,
+                        model=app_settings.openrouter_model_name,
+                        call_site=prompt_template.call_site
+                    )
+                yield {"event": "token", "data": {"text": question[len(sent):]}}
+                sent = question
+    except Exception as e:
+        logger.error(f"Error streaming dialog reply: {e}")
+
+    await user_message_task
+    if llm_response:
+        saved = await _save_ai_message(supabase, dialog_id, llm_response.followUpQuestion, llm_response.dict())
+    else:
+        saved = await _save_ai_message(supabase, dialog_id, AI_ERROR_TEXT, {})
+    _schedule_summary_update(supabase, dialog_id, context, user_text, saved.text)
+    yield {"event": "message", "data": saved.model_dump()}
@@ -0,0 +1,202 @@
+"""
+Background replenisher keeping adapted articles in stock for every (language, level, category) users ask for.
+
+POST /articles/generate only calls the LLM when no unassigned adapted article matches the user's settings.
+This task tops the stock up ahead of time, so generation usually is a pure database assignment.
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from supabase import AsyncClient
+
+from app.core.config import settings
+from app.core.db import get_supabase_pool
+from app.core.metrics import counter, gauge
+from app.services import article_adaptor
+from app.services.article_adaptor import AdaptationTarget
+from app.services.article_generator import SimpleArticleService
+
+logger = logging.getLogger(__name__)
+
+# (learning_language, language_level, category)
+Combination = Tuple[str, str, str]
+
+INVENTORY_STOCK = gauge(
+    "article_inventory_stock", "Adapted articles no user has been assigned yet", ["language", "level", "category"]
+)
+INVENTORY_REFILLED = counter(
+    "article_inventory_refilled_total", "Articles added to the stock, by source (adapted, generated)",
+    ["language", "level", "category", "source"]
+)
+INVENTORY_REFILL_FAILURES = counter(
+    "article_inventory_refill_failures_total", "Articles that failed to generate or adapt",
+    ["language", "level", "category"]
+)
+
+
+class InventoryReplenisher:
+    """
+    Periodically measures the stock of every combination and refills those below the low-water mark.
+
+    Stock is counted past the newest article of the combination assigned to anyone, i.e. what the
+    furthest-ahead user can still be given. Runs with the service-role client and is off unless
+    inventory_enabled is set.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._generator = SimpleArticleService()
+
+    def start(self) -> None:
+        if not settings.inventory_enabled:
+            return
+        if get_supabase_pool().service_client() is None:
+            logger.warning("Inventory replenisher needs SUPABASE_SERVICE_ROLE_KEY, not starting")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check(get_supabase_pool().service_client())
+            except Exception as e:
+                logger.error(f"Inventory check failed: {e}")
+            await asyncio.sleep(settings.inventory_check_interval)
+
+    async def check(self, supabase: AsyncClient) -> None:
+        """Measure every combination and refill the emptiest first, within the per-check budget."""
+        combinations = await self._combinations(supabase)
+        stock = {}
+        for combination in combinations:
+            stock[combination] = await self._stock(supabase, *combination)
+            INVENTORY_STOCK.set(stock[combination], **_labels(combination))
+
+        budget = settings.inventory_refill_budget
+        for combination in sorted(stock, key=stock.get):
+            if budget <= 0 or stock[combination] >= settings.inventory_low_water:
+                break
+            needed = min(settings.inventory_high_water - stock[combination], budget)
+            budget -= needed
+            added = await self._refill(supabase, combination, _targets(combination, combinations), needed)
+            INVENTORY_STOCK.set(stock[combination] + added, **_labels(combination))
+
+    async def _combinations(self, supabase: AsyncClient) -> Dict[Combination, str]:
+        """Every combination in user_settings, with the main language most of its users have."""
+        response = await supabase.table("user_settings") \
+            .select("main_language, learning_language, language_level, preferred_categories") \
+            .execute()
+        main_languages: Dict[Combination, Counter] = {}
+        for row in response.data or []:
+            if not row.get("learning_language") or not row.get("language_level"):
+                continue
+            for category in row.get("preferred_categories") or []:
+                combination = (row["learning_language"], row["language_level"], category)
+                main_languages.setdefault(combination, Counter())[row.get("main_language")] += 1
+        return {
+            combination: counts.most_common(1)[0][0]
+            for combination, counts in main_languages.items()
+        }
+
+    async def _stock(self, supabase: AsyncClient, language: str, level: str, category: str) -> int:
+        assigned = await supabase.table("user_x_adopted_article") \
+            .select("adopted_article_id, adapted_articles!inner(language, level, category)") \
+            .eq("adapted_articles.language", language) \
+            .eq("adapted_articles.level", level) \
+            .eq("adapted_articles.category", category) \
+            .order("adopted_article_id", desc=True) \
+            .limit(1) \
+            .execute()
+        watermark = assigned.data[0]["adopted_article_id"] if assigned.data else 0
+
+        response = await supabase.table("adapted_articles") \
+            .select("id", count="exact") \
+            .eq("language", language) \
+            .eq("level", level) \
+            .eq("category", category) \
+            .gt("id", watermark) \
+            .limit(1) \
+            .execute()
+        return response.count or 0
+
+    async def _refill(
+        self, supabase: AsyncClient, combination: Combination, targets: List[AdaptationTarget], needed: int
+    ) -> int:
+        """
+        Adapt source articles not yet adapted for the combination, generate the rest. Returns the number added.
+
+        Every article is batch-adapted into all demanded `targets` of its category at once, so the other
+        combinations of the category are stocked from the same LLM calls.
+        """
+        language, level, category = combination
+        last_adapted = await supabase.table("adapted_articles") \
+            .select("original_article_id") \
+            .eq("language", language) \
+            .eq("level", level) \
+            .eq("category", category) \
+            .order("original_article_id", desc=True) \
+            .limit(1) \
+            .execute()
+        last_original_id = last_adapted.data[0]["original_article_id"] if last_adapted.data else 0
+        sources = await supabase.table("articles") \
+            .select("id") \
+            .eq("category", category) \
+            .gt("id", last_original_id) \
+            .order("id") \
+            .limit(needed) \
+            .execute()
+        source_ids: List[int] = [row["id"] for row in sources.data or []]
+
+        async def adapt(article_id: int, source: str) -> bool:
+            try:
+                await article_adaptor.adapt_article_batch(article_id, targets, supabase)
+            except Exception as e:
+                logger.error(f"Inventory refill of {combination} failed: {e}")
+                INVENTORY_REFILL_FAILURES.inc(**_labels(combination))
+                return False
+            INVENTORY_REFILLED.inc(**_labels(combination), source=source)
+            return True
+
+        async def generate_and_adapt(count: int) -> List[bool]:
+            if count <= 0:
+                return []
+            try:
+                # one batched extended-model call per article_generation_batch_size articles
+                article_ids = await self._generator.generate_and_store_articles(category, count, None, supabase)
+            except Exception as e:
+                logger.error(f"Inventory generation for {combination} failed: {e}")
+                INVENTORY_REFILL_FAILURES.inc(count, **_labels(combination))
+                return []
+            return list(await asyncio.gather(*(adapt(article_id, "generated") for article_id in article_ids)))
+
+        to_generate = needed - len(source_ids)
+        logger.info(f"Refilling inventory {combination}: {len(source_ids)} to adapt, {to_generate} to generate")
+        # the LLM limiter caps how many of these run at once
+        *adapted, generated = await asyncio.gather(
+            *(adapt(article_id, "adapted") for article_id in source_ids),
+            generate_and_adapt(to_generate)
+        )
+        return sum(adapted) + sum(generated)
+
+
+def _targets(combination: Combination, combinations: Dict[Combination, str]) -> List[AdaptationTarget]:
+    """Adaptation targets of every combination in the category of `combination`, that one first."""
+    category = combination[2]
+    ordered = [combination] + [c for c in combinations if c[2] == category and c != combination]
+    return [(language, level, combinations[(language, level, category)]) for language, level, _ in ordered]
+
+
+def _labels(combination: Combination) -> Dict[str, str]:
+    language, level, category = combination
+    return {"language": language, "level": level, "category": category}
+
+
+inventory_replenisher = InventoryReplenisher()
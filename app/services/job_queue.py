@@ -0,0 +1,273 @@
+"""In-process asyncio job queue for long-running article work, persisted in the generation_jobs table."""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from postgrest.exceptions import APIError
+from supabase import AsyncClient
+
+from app.core.config import settings
+from app.core.db import get_supabase_pool
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[str], Awaitable[None]]
+JobHandler = Callable[[AsyncClient, Dict[str, Any], ProgressCallback], Awaitable[Any]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str):
+    """Register the coroutine that runs jobs of the given kind."""
+    def decorator(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+class JobQueue:
+    """
+    Worker pool consuming jobs from an asyncio queue.
+
+    Each job is a generation_jobs row, so its status survives a restart. A worker claims a job by moving it
+    from queued to running in one conditional update, so a job queued in several processes (e.g. during a
+    zero-downtime deploy, or with several uvicorn workers) runs once. Running jobs renew a lease by touching
+    updated_at; only jobs whose lease expired are taken over by another process, at startup and every
+    job_lease_seconds after.
+
+    Jobs run with the client of the user who submitted them, which holds the user's JWT until a worker picks
+    the job up. A job waiting longer than the token's lifetime fails to claim and stays queued until a
+    process with the service-role key recovers it, or until the user submits the same kind again after the
+    lease expired. Recovered jobs run with the service-role client. A job interrupted by shutdown is put
+    back in the queue.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._clients: Dict[str, AsyncClient] = {}
+        self._tasks: List[asyncio.Task] = []
+        # ids of the jobs in self._queue or being run by this process
+        self._pending: Set[str] = set()
+
+    async def start(self) -> None:
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_periodically()))
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they are running go back to queued (see _run) for the next recovery."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        supabase: AsyncClient,
+        user_id: str,
+        kind: str,
+        params: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Persist a new job and queue it. Returns the job row.
+
+        A user has at most one queued or running job of each kind: while one is active, submitting another
+        returns it instead, so repeated taps don't run (and pay for) the same generation twice. An active job
+        not updated for job_lease_seconds belongs to a process that is gone; it is marked failed and replaced.
+        With `idempotency_key`, a retry of a request the user already submitted returns the existing job
+        (whatever its status) instead of queueing the work again.
+        """
+        try:
+            return await self._submit(supabase, user_id, kind, params, idempotency_key)
+        except APIError as e:
+            # unique_violation on uq_generation_jobs_active_kind: the user already has an active job of this kind
+            if e.code != "23505":
+                raise
+            active = await supabase.table("generation_jobs") \
+                .select("*") \
+                .eq("user_id", user_id) \
+                .eq("kind", kind) \
+                .in_("status", ["queued", "running"]) \
+                .limit(1) \
+                .execute()
+            if not active.data:
+                raise
+            job = active.data[0]
+            if not _lease_expired(job):
+                return job
+            now = datetime.now(timezone.utc)
+            # conditional on the lease still being expired, so a job that just got picked up is not failed
+            await supabase.table("generation_jobs") \
+                .update({"status": "failed", "error": "Job lease expired", "updated_at": now.isoformat()}) \
+                .eq("id", job["id"]) \
+                .in_("status", ["queued", "running"]) \
+                .lt("updated_at", (now - timedelta(seconds=settings.job_lease_seconds)).isoformat()) \
+                .execute()
+            logger.info(f"Replacing job {job['id']} with an expired lease")
+            return await self.submit(supabase, user_id, kind, params, idempotency_key)
+
+    async def _submit(
+        self,
+        supabase: AsyncClient,
+        user_id: str,
+        kind: str,
+        params: Dict[str, Any],
+        idempotency_key: Optional[str]
+    ) -> Dict[str, Any]:
+        row = {
+            "user_id": user_id,
+            "kind": kind,
+            "params": params,
+            "status": "queued"
+        }
+        if idempotency_key:
+            row["idempotency_key"] = idempotency_key
+            response = await supabase.table("generation_jobs").upsert(
+                row, on_conflict="user_id,idempotency_key", ignore_duplicates=True
+            ).execute()
+            if not response.data:
+                existing = await supabase.table("generation_jobs") \
+                    .select("*") \
+                    .eq("user_id", user_id) \
+                    .eq("idempotency_key", idempotency_key) \
+                    .maybe_single() \
+                    .execute()
+                if existing and existing.data:
+                    return existing.data
+                raise Exception("Failed to create job")
+        else:
+            response = await supabase.table("generation_jobs").insert(row).execute()
+        if not response.data:
+            raise Exception("Failed to create job")
+
+        job = response.data[0]
+        self._clients[job["id"]] = supabase
+        await self._enqueue(job)
+        return job
+
+    async def _enqueue(self, job: Dict[str, Any]) -> None:
+        self._pending.add(job["id"])
+        await self._queue.put(job)
+
+    async def get(self, supabase: AsyncClient, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        response = await supabase.table("generation_jobs") \
+            .select("*") \
+            .eq("id", job_id) \
+            .eq("user_id", user_id) \
+            .maybe_single() \
+            .execute()
+        if not response:
+            return None
+        return response.data
+
+    async def _recover(self, stale_only: bool = False) -> None:
+        """
+        Queue jobs still queued, and jobs running in a process that stopped renewing their lease
+        (needs the service-role key). Jobs another live process is running or claims first are skipped.
+        With `stale_only`, only queued jobs not updated for job_lease_seconds are taken, so jobs other
+        processes are about to run are left to them.
+        """
+        supabase = get_supabase_pool().service_client()
+        if supabase is None:
+            return
+        now = datetime.now(timezone.utc)
+        cutoff = (now - timedelta(seconds=settings.job_lease_seconds)).isoformat()
+        expired = await supabase.table("generation_jobs") \
+            .update({"status": "queued", "updated_at": now.isoformat()}) \
+            .eq("status", "running") \
+            .lt("updated_at", cutoff) \
+            .execute()
+        if expired.data:
+            logger.info(f"Took over {len(expired.data)} jobs with an expired lease")
+        query = supabase.table("generation_jobs") \
+            .select("*") \
+            .eq("status", "queued")
+        if stale_only:
+            query = query.lt("updated_at", cutoff)
+        response = await query.order("created_at").execute()
+        jobs = {job["id"]: job for job in [*(expired.data or []), *(response.data or [])]}
+        recovered = [job for job_id, job in jobs.items() if job_id not in self._pending]
+        for job in recovered:
+            await self._enqueue(job)
+        if recovered:
+            logger.info(f"Recovered {len(recovered)} unfinished jobs")
+
+    async def _recover_periodically(self) -> None:
+        """Recover jobs left behind by a process that stopped while this one runs."""
+        while True:
+            await asyncio.sleep(settings.job_lease_seconds)
+            try:
+                await self._recover(stale_only=True)
+            except Exception as e:
+                logger.error(f"Job recovery failed: {e}")
+
+    async def _claim(self, supabase: AsyncClient, job: Dict[str, Any]) -> bool:
+        """Atomically move the job from queued to running; False if another worker or process got it first."""
+        response = await supabase.table("generation_jobs") \
+            .update({"status": "running", "updated_at": datetime.now(timezone.utc).isoformat()}) \
+            .eq("id", job["id"]) \
+            .eq("status", "queued") \
+            .execute()
+        return bool(response.data)
+
+    async def _renew_lease(self, update: Callable[..., Awaitable[None]]) -> None:
+        while True:
+            await asyncio.sleep(settings.job_lease_seconds / 3)
+            try:
+                await update()
+            except Exception as e:
+                logger.warning(f"Could not renew job lease: {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error(f"Job {job['id']} could not be recorded: {e}")
+            finally:
+                self._pending.discard(job["id"])
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        supabase = self._clients.pop(job["id"], None) or get_supabase_pool().service_client()
+        if supabase is None:
+            logger.error(f"No client available to run job {job['id']}")
+            return
+
+        async def update(**fields: Any) -> None:
+            fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+            await supabase.table("generation_jobs").update(fields).eq("id", job["id"]).execute()
+
+        async def progress(step: str) -> None:
+            await update(progress=step)
+
+        if not await self._claim(supabase, job):
+            logger.info(f"Job {job['id']} was claimed elsewhere, skipping")
+            return
+        lease = asyncio.create_task(self._renew_lease(update))
+        try:
+            result = await _handlers[job["kind"]](supabase, job, progress)
+        except asyncio.CancelledError:
+            # shutting down: hand the job back instead of leaving it running under a lease nobody renews
+            logger.info(f"Job {job['id']} interrupted, putting it back in the queue")
+            await update(status="queued", progress=None)
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            await update(status="failed", error=str(e))
+            return
+        finally:
+            lease.cancel()
+        await update(status="completed", progress=None, result=result)
+
+
+def _lease_expired(job: Dict[str, Any]) -> bool:
+    updated_at = datetime.fromisoformat(job["updated_at"])
+    return datetime.now(timezone.utc) - updated_at > timedelta(seconds=settings.job_lease_seconds)
+
+
+job_queue = JobQueue(workers=settings.job_workers)
@@ -0,0 +1,141 @@
+"""
+Content-addressed cache of LLM responses for deterministic prompts (e.g. article adaptation).
+
+Entries are keyed by a hash of (model, prompt version, prompt args, output schema) and stored as the
+validated output serialised to JSON. Not meant for the dialog path, where every turn must be fresh.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
+from typing import Any, Dict, Optional, Protocol, Type
+
+from pydantic import BaseModel
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+class LLMCacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[str]: ...
+
+    async def set(self, key: str, value: str) -> None: ...
+
+    def stats(self) -> dict: ...
+
+
+class MemoryLLMCache:
+    """Per-process LRU with TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_size=max_entries, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class SQLiteLLMCache:
+    """
+    Local SQLite store, so cached responses survive restarts. Expired rows are ignored on read and
+    removed on write; above max_entries the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_used_at ON llm_responses(used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT value FROM llm_responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE llm_responses SET used_at = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                "SELECT key FROM llm_responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await asyncio.to_thread(self._get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> Optional[LLMCacheBackend]:
+    """The configured backend, or None when llm_cache_backend is "none"."""
+    if settings.llm_cache_backend == "memory":
+        return MemoryLLMCache(settings.llm_cache_max_entries, settings.llm_cache_ttl)
+    if settings.llm_cache_backend == "sqlite":
+        return SQLiteLLMCache(settings.llm_cache_path, settings.llm_cache_max_entries, settings.llm_cache_ttl)
+    return None
+
+
+def llm_cache_stats() -> Optional[dict]:
+    cache = get_llm_cache()
+    return cache.stats() if cache else None
+
+
+def make_cache_key(
+    model_name: str, prompt_key: str, prompt_args: Dict[str, Any], output_schema: Type[BaseModel]
+) -> str:
+    """Hash of everything that determines the answer; the schema's JSON schema covers field changes."""
+    payload = json.dumps(
+        {
+            "model": model_name,
+            "prompt": prompt_key,
+            "args": prompt_args,
+            "schema": output_schema.model_json_schema()
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -1,70 +1,354 @@
+import asyncio
+import hashlib
+import json
 import logging
-from typing import Dict, Any, Type
+import random
+import time
+from contextvars import ContextVar
+from functools import lru_cache, partial
+from typing import AsyncIterator, Dict, Any, Optional, Set, Tuple, Type, Union
 
-from langchain_core.messages import AIMessage
-from langchain_core.runnables import RunnableLambda
+import httpx
+import openai
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable, RunnableLambda
 
 from app.core.config import settings
+from app.core.metrics import counter, histogram
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.exceptions import OutputParserException
-from pydantic import BaseModel
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel, ValidationError
 from json_repair import repair_json
 from langchain.output_parsers import OutputFixingParser
+from app.services.llm_cache import get_llm_cache, make_cache_key
+from app.services.prompt_registry import CompiledPrompt, PromptTemplateError, compile_prompt
+from app.services.prompt_service import ChatPrompt
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 extended_model_name = "perplexity/sonar-pro"  # expencive model for reasoning tasks
 
-def wrapper_repair_json(input):
-    res = repair_json(input)
-    return res
+PromptTemplateInput = Union[str, ChatPrompt, CompiledPrompt]
+
+LLM_CALLS = counter(
+    "llm_calls_total", "LLM calls by outcome (ok, error, cache_hit)", ["model", "call_site", "outcome"]
+)
+LLM_DURATION = histogram(
+    "llm_call_duration_seconds", "Wall-clock time of an LLM call, including retries and fixing", ["model", "call_site"]
+)
+LLM_TIME_TO_FIRST_TOKEN = histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed text the user sees", ["model", "call_site"]
+)
+LLM_TOKENS = counter(
+    "llm_tokens_total", "Tokens by kind (prompt, cached_prompt, completion)", ["model", "call_site", "kind"]
+)
+LLM_COST = counter("llm_cost_usd_total", "Cost reported by OpenRouter", ["model", "call_site"])
+LLM_RETRIES = counter("llm_retries_total", "HTTP attempts beyond the first one of a call", ["model", "call_site"])
+LLM_PARSE = counter(
+    "llm_parse_total", "Answers by the parse tier that produced them (valid, repaired, llm_fixed, failed)",
+    ["model", "call_site", "tier"]
+)
+
+# HTTP requests / fixer runs of the LLM call running in the current task (see _count_attempt)
+_call_state: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_call_state", default=None)
+
+# Models that rejected response_format; they use the "prompt" output mode for the rest of the process
+_no_response_format: Set[str] = set()
+
+def clean_json_text(cnt: str) -> str:
+    return cnt.strip().replace("```json", "").replace("```", "")
 
 def transform_string(message: AIMessage) -> str:
     """
     Transforms the input string by removing leading and trailing whitespace.
     This is a placeholder for any additional transformations needed.
     """
-    cnt = message.content
-    return cnt.strip().replace("```json", "").replace("```", "")
+    return clean_json_text(message.content)
+
+
+async def _count_attempt(request: httpx.Request) -> None:
+    state = _call_state.get()
+    if state is not None:
+        state["attempts"] += 1
+
+
+def _start_call() -> Dict[str, Any]:
+    """Fresh per-call state; the httpx hook and the parser update it in place."""
+    state = {"attempts": 0, "fixer": 0, "started": time.perf_counter()}
+    _call_state.set(state)
+    return state
+
+
+def _finish_call(state: Dict[str, Any], model_name: str, call_site: str, outcome: str) -> None:
+    LLM_CALLS.inc(model=model_name, call_site=call_site, outcome=outcome)
+    elapsed = time.perf_counter() - state["started"]
+    if outcome != "cache_hit":
+        LLM_DURATION.observe(elapsed, model=model_name, call_site=call_site)
+    retries = state["attempts"] - 1 - state["fixer"]
+    if retries > 0:
+        LLM_RETRIES.inc(retries, model=model_name, call_site=call_site)
+    logger.info(f"LLM call: model={model_name}, call_site={call_site}, outcome={outcome}, seconds={elapsed:.2f}")
+
+
+def _log_prompt_sampled() -> bool:
+    """Whether this call logs its full prompt arguments and answer (llm_prompt_log_sample_rate)."""
+    return random.random() < settings.llm_prompt_log_sample_rate
+
+
+@lru_cache(maxsize=None)
+def _get_llm(model_name: str) -> ChatOpenAI:
+    """One long-lived client per model so HTTP connections are pooled across calls."""
+    limits = httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive,
+    )
+    return ChatOpenAI(
+        model=model_name,
+        openai_api_key=settings.openrouter_api_key,
+        openai_api_base=settings.openrouter_api_base,
+        max_retries=3,
+        # usage (incl. cached prompt tokens) is also reported at the end of a stream
+        stream_usage=True,
+        # OpenRouter usage accounting: adds the cost of the call to usage
+        extra_body={"usage": {"include": True}},
+        http_async_client=httpx.AsyncClient(limits=limits, event_hooks={"request": [_count_attempt]}),
+    )
+
+
+def _call_site(prompt: PromptTemplateInput) -> str:
+    if isinstance(prompt, CompiledPrompt):
+        return prompt.call_site
+    return prompt.name if isinstance(prompt, ChatPrompt) else "other"
+
+
+def _prompt_key(prompt: PromptTemplateInput) -> str:
+    """Registered prompts are identified by name and version, ad-hoc ones by a hash of their text."""
+    if isinstance(prompt, CompiledPrompt):
+        return prompt.key
+    text = prompt if isinstance(prompt, str) else prompt.system + prompt.user
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _record_usage(model_name: str, call_site: str, message: AIMessage) -> AIMessage:
+    """Adds the token usage (incl. tokens served from the provider's prompt cache) and cost of one answer."""
+    usage = message.usage_metadata
+    if not usage:
+        return message
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model_name, call_site=call_site, kind="prompt")
+    LLM_TOKENS.inc(cached, model=model_name, call_site=call_site, kind="cached_prompt")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model_name, call_site=call_site, kind="completion")
+    cost = (message.response_metadata.get("token_usage") or {}).get("cost")
+    if cost:
+        LLM_COST.inc(cost, model=model_name, call_site=call_site)
+    logger.debug(
+        f"LLM usage: model={model_name}, call_site={call_site}, input={usage.get('input_tokens', 0)}, "
+        f"cached_input={cached}, output={usage.get('output_tokens', 0)}, cost={cost}"
+    )
+    return message
+
+
+async def _parse_output(
+    parser: OutputFixingParser,
+    output_schema: Type[BaseModel],
+    model_name: str,
+    call_site: str,
+    text: str
+) -> BaseModel:
+    """
+    Parses an LLM answer in tiers, cheapest first:
+    1. valid     - the text is already valid JSON for the schema (pydantic-core's JSON parser)
+    2. repaired  - json_repair fixes quotes/commas/truncation locally
+    3. llm_fixed - OutputFixingParser asks the LLM to fix it (an extra, paid LLM call)
+    """
+    cleaned = clean_json_text(text)
+    tier = "failed"
+    try:
+        try:
+            result = output_schema.model_validate_json(cleaned)
+            tier = "valid"
+            return result
+        except ValidationError:
+            pass
+
+        try:
+            result = output_schema.model_validate(repair_json(cleaned, return_objects=True))
+            tier = "repaired"
+            return result
+        except ValidationError:
+            pass
+
+        logger.warning(f"LLM output needs the LLM fixer: model={model_name}, call_site={call_site}")
+        state = _call_state.get()
+        if state is not None:
+            state["fixer"] += 1
+        result = await parser.aparse(cleaned)
+        tier = "llm_fixed"
+        return result
+    finally:
+        LLM_PARSE.inc(model=model_name, call_site=call_site, tier=tier)
+
+
+@lru_cache(maxsize=None)
+def _get_limiter(model_name: str) -> asyncio.Semaphore:
+    """Process-wide semaphore capping in-flight calls per model."""
+    if model_name == extended_model_name:
+        return asyncio.Semaphore(settings.llm_extended_max_concurrency)
+    return asyncio.Semaphore(settings.llm_max_concurrency)
+
+
+def _output_mode(model_name: str, prompt: PromptTemplateInput) -> str:
+    """llm_output_mode for the model, or "prompt" where provider-side JSON is not used."""
+    if not isinstance(prompt, CompiledPrompt) or not prompt.structured_output or model_name in _no_response_format:
+        return "prompt"
+    return settings.llm_extended_output_mode if model_name == extended_model_name else settings.llm_output_mode
+
+
+def _response_format(mode: str, output_schema: Type[BaseModel]) -> Optional[Dict[str, Any]]:
+    if mode == "json_mode":
+        return {"type": "json_object"}
+    if mode == "json_schema":
+        # Not strict: strict mode rejects open objects such as usedVocabulary / metadata
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": output_schema.__name__, "schema": output_schema.model_json_schema(), "strict": False}
+        }
+    return None
+
+
+@lru_cache(maxsize=settings.llm_chain_cache_size)
+def _get_model(model_name: str, output_schema: Type[BaseModel], mode: str) -> Runnable:
+    """The shared client, bound to the response_format of the output mode."""
+    response_format = _response_format(mode, output_schema)
+    llm = _get_llm(model_name)
+    return llm.bind(response_format=response_format) if response_format else llm
+
+
+def _fall_back_to_prompt_mode(model_name: str, mode: str, error: openai.BadRequestError) -> None:
+    """Called when a request with response_format failed; the caller retries in "prompt" mode."""
+    logger.warning(f"LLM request in {mode} mode failed, retrying without response_format: model={model_name}, error={error}")
+    if "response_format" in str(error) or "json" in str(error).lower():
+        _no_response_format.add(model_name)
+
+
+@lru_cache(maxsize=settings.llm_chain_cache_size)
+def _get_prompt_and_parser(
+    model_name: str, output_schema: Type[BaseModel], prompt_template_str: PromptTemplateInput, mode: str = "prompt"
+) -> Tuple[ChatPromptTemplate, OutputFixingParser]:
+    """
+    Prompt template and output parser, built once per (model, schema, template, output mode).
+    Registered prompts come precompiled (without the schema dump in "json_schema" mode);
+    plain strings and ChatPrompts are compiled here.
+    """
+    llm = _get_llm(model_name)
+    # if extended_model:
+    #     logger.info(f"Using extended model: {extended_model_name}")
+    #     tool = {"type": "web_search_preview"}
+    #     llm = llm.bind_tools([tool])
+
+    parser = PydanticOutputParser(pydantic_object=output_schema)
+    new_parser = OutputFixingParser.from_llm(parser=parser, llm=llm)
+    if isinstance(prompt_template_str, CompiledPrompt):
+        if prompt_template_str.output_schema is not output_schema:
+            raise PromptTemplateError(
+                f"Prompt {prompt_template_str.key} is registered for {prompt_template_str.output_schema.__name__}, "
+                f"not {output_schema.__name__}"
+            )
+        prompt_template = prompt_template_str.schema_template if mode == "json_schema" else prompt_template_str.template
+    else:
+        prompt_template = compile_prompt(prompt_template_str, parser.get_format_instructions())
+    return prompt_template, new_parser
+
+
+@lru_cache(maxsize=settings.llm_chain_cache_size)
+def _get_chain(
+    model_name: str, output_schema: Type[BaseModel], prompt_template_str: PromptTemplateInput, mode: str = "prompt"
+) -> Runnable:
+    """Compiled prompt | llm | tiered parser chain, built once per (model, schema, template, output mode)."""
+    prompt_template, new_parser = _get_prompt_and_parser(model_name, output_schema, prompt_template_str, mode)
+    call_site = _call_site(prompt_template_str)
+    record_usage = RunnableLambda(partial(_record_usage, model_name, call_site))
+    parse = RunnableLambda(partial(_parse_output, new_parser, output_schema, model_name, call_site))
+    return prompt_template | _get_model(model_name, output_schema, mode) | record_usage | transform_string | parse
+
+
+async def _astream_chunks(
+    model_name: str,
+    output_schema: Type[BaseModel],
+    prompt_template_str: PromptTemplateInput,
+    mode: str,
+    prompt_args: Dict[str, Any]
+) -> AsyncIterator[AIMessageChunk]:
+    prompt_template, _ = _get_prompt_and_parser(model_name, output_schema, prompt_template_str, mode)
+    started = False
+    try:
+        async for chunk in (prompt_template | _get_model(model_name, output_schema, mode)).astream(prompt_args):
+            started = True
+            yield chunk
+    except openai.BadRequestError as e:
+        if mode == "prompt" or started:
+            raise
+        _fall_back_to_prompt_mode(model_name, mode, e)
+        async for chunk in _astream_chunks(model_name, output_schema, prompt_template_str, "prompt", prompt_args):
+            yield chunk
+
 
 async def callLLM(
-    prompt_template_str: str,
+    prompt_template_str: PromptTemplateInput,
     prompt_args: Dict[str, Any],
     output_schema: Type[BaseModel],
-    extended_model: bool = False
+    extended_model: bool = False,
+    use_cache: bool = False
 ) -> BaseModel:
     """
     Calls the OpenRouter API with a given prompt template and arguments using LangChain.
     Includes a retry mechanism and returns a Pydantic object.
+
+    prompt_template_str is a registered CompiledPrompt (see prompt_registry), or a single template
+    string / ChatPrompt compiled on first use.
+
+    use_cache serves and stores the validated response in the LLM response cache (see llm_cache).
+    Only for prompts whose answer may be reused for identical arguments, never for dialog turns.
     """
+    if isinstance(prompt_template_str, CompiledPrompt):
+        prompt_template_str.check_arguments(prompt_args)
+    model_name = settings.openrouter_model_name if not extended_model else extended_model_name
+    call_site = _call_site(prompt_template_str)
+    state = _start_call()
+    outcome = "error"
     try:
-        llm = ChatOpenAI(
-            model=settings.openrouter_model_name if not extended_model else extended_model_name,
-            openai_api_key=settings.openrouter_api_key,
-            openai_api_base=settings.openrouter_api_base,
-            max_retries=3,
-        )
-        # if extended_model:
-        #     logger.info(f"Using extended model: {extended_model_name}")
-        #     tool = {"type": "web_search_preview"}
-        #     llm = llm.bind_tools([tool])
-
-        parser = PydanticOutputParser(pydantic_object=output_schema)
-        new_parser = OutputFixingParser.from_llm(parser=parser, llm=llm)
-        prompt_template = ChatPromptTemplate.from_template(
-            template=prompt_template_str,
-            partial_variables={"format_instructions": parser.get_format_instructions()}
-        )
-        logger.info(prompt_template.pretty_print())
-
-        chain = prompt_template | llm | transform_string |  RunnableLambda(wrapper_repair_json) | new_parser
-
-        logger.info(f"Calling LLM: model={settings.openrouter_model_name}, template='{prompt_template_str}', args={prompt_args}")
-        response = await chain.ainvoke(prompt_args)
-        logger.info(f"LLM response: {response}")
+        mode = _output_mode(model_name, prompt_template_str)
+        chain = _get_chain(model_name, output_schema, prompt_template_str, mode)
+
+        llm_cache = get_llm_cache() if use_cache else None
+        if llm_cache:
+            cache_key = make_cache_key(model_name, _prompt_key(prompt_template_str), prompt_args, output_schema)
+            cached = await llm_cache.get(cache_key)
+            if cached is not None:
+                outcome = "cache_hit"
+                return output_schema.model_validate_json(cached)
+
+        log_prompt = _log_prompt_sampled()
+        if log_prompt:
+            logger.info(f"LLM prompt: model={model_name}, call_site={call_site}, mode={mode}, args={prompt_args}")
+        async with _get_limiter(model_name):
+            try:
+                response = await chain.ainvoke(prompt_args)
+            except openai.BadRequestError as e:
+                if mode == "prompt":
+                    raise
+                _fall_back_to_prompt_mode(model_name, mode, e)
+                response = await _get_chain(model_name, output_schema, prompt_template_str).ainvoke(prompt_args)
+        if log_prompt:
+            logger.info(f"LLM response: model={model_name}, call_site={call_site}, response={response}")
 
+        if llm_cache:
+            await llm_cache.set(cache_key, response.model_dump_json())
+
+        outcome = "ok"
         return response
 
     except OutputParserException as e:
@@ -73,3 +357,56 @@ async def callLLM(
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
         raise
+    finally:
+        _finish_call(state, model_name, call_site, outcome)
+
+
+async def streamLLM(
+    prompt_template_str: PromptTemplateInput,
+    prompt_args: Dict[str, Any],
+    output_schema: Type[BaseModel],
+    extended_model: bool = False
+) -> AsyncIterator[Union[Dict[str, Any], BaseModel]]:
+    """
+    Streams the LLM answer for the same prompt/schema contract as callLLM.
+
+    Yields the partially parsed JSON object (dict) each time a new chunk arrives, and finally
+    the fully validated output_schema instance.
+    """
+    if isinstance(prompt_template_str, CompiledPrompt):
+        prompt_template_str.check_arguments(prompt_args)
+    model_name = settings.openrouter_model_name if not extended_model else extended_model_name
+    call_site = _call_site(prompt_template_str)
+    mode = _output_mode(model_name, prompt_template_str)
+    _, parser = _get_prompt_and_parser(model_name, output_schema, prompt_template_str, mode)
+
+    log_prompt = _log_prompt_sampled()
+    if log_prompt:
+        logger.info(f"LLM prompt (stream): model={model_name}, call_site={call_site}, mode={mode}, args={prompt_args}")
+    state = _start_call()
+    outcome = "error"
+    text = ""
+    try:
+        async with _get_limiter(model_name):
+            async for chunk in _astream_chunks(model_name, output_schema, prompt_template_str, mode, prompt_args):
+                if chunk.usage_metadata:
+                    _record_usage(model_name, call_site, chunk)
+                text += chunk.content
+                cleaned = clean_json_text(text)
+                start = cleaned.find("{")
+                if start < 0:
+                    continue
+                try:
+                    partial = parse_partial_json(cleaned[start:])
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(partial, dict):
+                    yield partial
+
+        response = await _parse_output(parser, output_schema, model_name, call_site, text)
+        outcome = "ok"
+    finally:
+        _finish_call(state, model_name, call_site, outcome)
+    if log_prompt:
+        logger.info(f"LLM response: model={model_name}, call_site={call_site}, response={response}")
+    yield response
@@ -0,0 +1,211 @@
+"""
+MinHash near-duplicate detection for source articles.
+
+Each article gets a MinHash signature of its word 3-gram shingles (stored base64-encoded in
+articles.minhash). The estimated Jaccard similarity of two articles is the share of equal signature
+positions; LSH banding finds candidate pairs without comparing every pair.
+"""
+import base64
+import logging
+import re
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from supabase import AsyncClient
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128
+# 32 bands of 4 rows: pairs above ~0.42 similarity become candidates, checked against the threshold
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_MASK = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(20240601)
+# Hash family h(x) = (a * x + b) mod 2^32 with odd a, one per signature position
+_A = (_rng.integers(1, 2 ** 32, NUM_PERM, dtype=np.uint64) | np.uint64(1))
+_B = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+_BASE = np.uint64(0x01000193)
+
+
+def _shingles(text: str) -> np.ndarray:
+    """32-bit hashes of the word SHINGLE_SIZE-grams of the lower-cased text."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return np.zeros(1, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode()) for word in words), dtype=np.uint64, count=len(words))
+    if len(words) < SHINGLE_SIZE:
+        return word_hashes
+    # Polynomial hash of each window of SHINGLE_SIZE words, computed for all windows at once
+    count = len(words) - SHINGLE_SIZE + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        shingles = (shingles * _BASE + word_hashes[offset:offset + count]) & _MASK
+    return np.unique(shingles)
+
+
+def signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of the text."""
+    shingles = _shingles(text)
+    # (shingles x NUM_PERM) hash values; the minimum of each column is one signature position
+    hashed = (np.outer(shingles, _A) + _B) & _MASK
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def encode_signature(sig: np.ndarray) -> str:
+    return base64.b64encode(sig.astype("<u4").tobytes()).decode()
+
+
+def decode_signature(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype="<u4").astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two articles' shingle sets."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index: article ids by signature band, plus the signatures for verifying candidates and
+    the creation time of the articles that have one, for evict_before.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+        self._signatures: Dict[int, np.ndarray] = {}
+        self._created_at: Dict[int, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _bands(sig: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(BANDS):
+            yield band, sig[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def add(self, article_id: int, sig: np.ndarray, created_at: Optional[datetime] = None) -> None:
+        if article_id in self._signatures:
+            return
+        self._signatures[article_id] = sig
+        if created_at is not None:
+            self._created_at[article_id] = created_at
+        for band, key in self._bands(sig):
+            self._buckets[band].setdefault(key, []).append(article_id)
+
+    def remove(self, article_id: int) -> None:
+        sig = self._signatures.pop(article_id, None)
+        if sig is None:
+            return
+        self._created_at.pop(article_id, None)
+        for band, key in self._bands(sig):
+            bucket = self._buckets[band][key]
+            bucket.remove(article_id)
+            if not bucket:
+                del self._buckets[band][key]
+
+    def evict_before(self, cutoff: datetime) -> None:
+        """Remove the articles created before the cutoff."""
+        for article_id in [article_id for article_id, created_at in self._created_at.items() if created_at < cutoff]:
+            self.remove(article_id)
+
+    def query(self, sig: np.ndarray) -> List[Tuple[int, float]]:
+        """Indexed articles at least `threshold` similar to the signature, most similar first."""
+        candidates = set()
+        for band, key in self._bands(sig):
+            candidates.update(self._buckets[band].get(key, ()))
+        matches = [(article_id, similarity(sig, self._signatures[article_id])) for article_id in candidates]
+        return sorted(
+            [(article_id, score) for article_id, score in matches if score >= self.threshold],
+            key=lambda match: match[1],
+            reverse=True
+        )
+
+    def find_duplicate(self, sig: np.ndarray) -> Optional[int]:
+        matches = self.query(sig)
+        return matches[0][0] if matches else None
+
+
+# category -> (time.monotonic() of the load, index of that category's recent articles), loaded on first use,
+# kept up to date by add_article and reloaded after near_duplicate_index_ttl
+_indexes: Dict[str, Tuple[float, NearDuplicateIndex]] = {}
+
+
+async def get_category_index(supabase: AsyncClient, category: str) -> NearDuplicateIndex:
+    """Index of the category's articles of the last near_duplicate_window_days that have a signature."""
+    since = datetime.now(timezone.utc) - timedelta(days=settings.near_duplicate_window_days)
+    loaded = _indexes.get(category)
+    if loaded is not None and time.monotonic() - loaded[0] < settings.near_duplicate_index_ttl:
+        # articles that left the window since the load
+        loaded[1].evict_before(since)
+        return loaded[1]
+
+    response = await supabase.table("articles") \
+        .select("id, minhash, created_at") \
+        .eq("category", category) \
+        .gte("created_at", since.isoformat()) \
+        .not_.is_("minhash", "null") \
+        .execute()
+    index = NearDuplicateIndex(settings.near_duplicate_threshold)
+    for row in response.data or []:
+        index.add(row["id"], decode_signature(row["minhash"]), _parse_timestamp(row["created_at"]))
+    # a concurrent load may have replaced the stale index first; keep one index per category
+    current = _indexes.get(category)
+    if current is loaded:
+        current = _indexes[category] = (time.monotonic(), index)
+    return current[1]
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """A PostgREST timestamp, read as UTC if it has no time zone."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def add_article(category: str, article_id: int, sig: np.ndarray) -> None:
+    """Make a newly stored article visible to the category index, if it is loaded."""
+    loaded = _indexes.get(category)
+    if loaded is not None:
+        loaded[1].add(article_id, sig, datetime.now(timezone.utc))
+
+
+async def drop_near_duplicates(
+    supabase: AsyncClient, candidate_ids: Sequence[int], seen_ids: Sequence[int]
+) -> List[int]:
+    """
+    The candidate article ids, in order, without those near-duplicating a seen article or an earlier
+    candidate. Articles without a stored signature are always kept.
+    """
+    ids = list(dict.fromkeys([*seen_ids, *candidate_ids]))
+    if not candidate_ids or not ids:
+        return list(candidate_ids)
+    response = await supabase.table("articles") \
+        .select("id, minhash") \
+        .in_("id", ids) \
+        .not_.is_("minhash", "null") \
+        .execute()
+    signatures = {row["id"]: decode_signature(row["minhash"]) for row in response.data or []}
+
+    index = NearDuplicateIndex(settings.near_duplicate_threshold)
+    for article_id in seen_ids:
+        if article_id in signatures:
+            index.add(article_id, signatures[article_id])
+
+    kept = []
+    for article_id in candidate_ids:
+        sig = signatures.get(article_id)
+        if sig is not None:
+            duplicate_of = index.find_duplicate(sig)
+            if duplicate_of is not None and duplicate_of != article_id:
+                logger.info(f"Skipping article {article_id}, a near-duplicate of article {duplicate_of}")
+                continue
+            index.add(article_id, sig)
+        kept.append(article_id)
+    return kept
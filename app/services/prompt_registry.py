@@ -0,0 +1,177 @@
+"""
+Prompt templates compiled once at import time.
+
+Every prompt the services send is registered here with its output schema and the arguments its
+callers pass. Registration compiles the LangChain template (format instructions included) and fails
+fast when the template's variables and the declared arguments differ, so a broken template stops the
+app at startup instead of failing a request.
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Type, Union
+
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.schemas.admin import BatchAdaptationResponse, ProcessedArticleResponse
+from app.schemas.articles import ArticleListResponse, ArticleResponse
+from app.schemas.dialogs import (
+    DialogFollowUPRequestLLMSchema,
+    DialogFollowUpResponseLLMSchema,
+    DialogSummaryLLMSchema
+)
+from app.services.prompt_service import ChatPrompt, PromptService
+
+# Passed by every caller that personalises a prompt to the user's settings
+LANGUAGE_ARGUMENTS = frozenset({"main_language", "learning_language", "lang_level"})
+
+# Stands in for the JSON schema dump when the provider enforces the schema (llm_output_mode="json_schema")
+SCHEMA_ENFORCED_INSTRUCTIONS = "Respond with a single JSON object that matches the provided response schema."
+
+
+class PromptTemplateError(ValueError):
+    """A prompt template does not match the arguments its callers pass."""
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledPrompt:
+    """
+    A registered prompt: compiled template, output schema and the argument names it expects.
+    `schema_template` is the same prompt without the schema dump, used when the provider enforces the
+    schema; `structured_output` is False for prompts that must not use the provider's JSON modes.
+    `call_site` labels the prompt's LLM metrics.
+    """
+    name: str
+    call_site: str
+    version: int
+    template: ChatPromptTemplate
+    schema_template: ChatPromptTemplate
+    output_schema: Type[BaseModel]
+    arguments: FrozenSet[str]
+    structured_output: bool
+
+    @property
+    def key(self) -> str:
+        """Stable identifier of this prompt text, e.g. for keying cached outputs."""
+        return f"{self.name}:v{self.version}"
+
+    def check_arguments(self, prompt_args: Dict[str, object]) -> None:
+        missing = self.arguments - prompt_args.keys()
+        if missing:
+            raise PromptTemplateError(f"Prompt {self.key} is missing arguments: {sorted(missing)}")
+
+
+_registry: Dict[str, CompiledPrompt] = {}
+
+
+def compile_prompt(prompt: Union[str, ChatPrompt], format_instructions: str) -> ChatPromptTemplate:
+    """
+    A plain string becomes a single user message. A ChatPrompt becomes a system message (the static,
+    cacheable prefix) followed by the user message; with llm_prompt_cache_control the system block
+    carries a cache_control breakpoint for providers that need one (e.g. Anthropic via OpenRouter).
+    """
+    if isinstance(prompt, str):
+        return ChatPromptTemplate.from_template(
+            template=prompt,
+            partial_variables={"format_instructions": format_instructions}
+        )
+
+    if settings.llm_prompt_cache_control:
+        system = SystemMessagePromptTemplate.from_template(
+            [{"type": "text", "text": prompt.system, "cache_control": {"type": "ephemeral"}}]
+        )
+    else:
+        system = SystemMessagePromptTemplate.from_template(prompt.system)
+    prompt_template = ChatPromptTemplate.from_messages([system, HumanMessagePromptTemplate.from_template(prompt.user)])
+    if "format_instructions" in prompt_template.input_variables:
+        prompt_template = prompt_template.partial(format_instructions=format_instructions)
+    return prompt_template
+
+
+def register_prompt(
+    prompt: ChatPrompt,
+    call_site: str,
+    output_schema: Type[BaseModel],
+    arguments: Iterable[str],
+    structured_output: bool = True
+) -> CompiledPrompt:
+    """Compile a prompt and check its variables against the arguments its callers pass."""
+    if prompt.name in _registry:
+        raise PromptTemplateError(f"Prompt {prompt.name} is already registered")
+
+    format_instructions = PydanticOutputParser(pydantic_object=output_schema).get_format_instructions()
+    try:
+        template = compile_prompt(prompt, format_instructions)
+        schema_template = compile_prompt(prompt, SCHEMA_ENFORCED_INSTRUCTIONS)
+    except Exception as e:
+        raise PromptTemplateError(f"Prompt {prompt.name} does not compile: {e}") from e
+
+    arguments = frozenset(arguments)
+    variables = set(template.input_variables)
+    if variables != arguments:
+        raise PromptTemplateError(
+            f"Prompt {prompt.name} variables do not match its arguments: "
+            f"not passed {sorted(variables - arguments)}, not used {sorted(arguments - variables)}"
+        )
+
+    compiled = CompiledPrompt(
+        name=prompt.name,
+        call_site=call_site,
+        version=prompt.version,
+        template=template,
+        schema_template=schema_template,
+        output_schema=output_schema,
+        arguments=arguments,
+        structured_output=structured_output
+    )
+    _registry[prompt.name] = compiled
+    return compiled
+
+
+ARTICLE_ADAPTATION = register_prompt(
+    PromptService.get_article_adaptation_prompt(),
+    "adaptation",
+    ProcessedArticleResponse,
+    LANGUAGE_ARGUMENTS | {"article", "size_limit"}
+)
+
+# Source text sent once for several (language, level) targets; the system part does not depend on the user
+ARTICLE_BATCH_ADAPTATION = register_prompt(
+    PromptService.get_article_batch_adaptation_prompt(),
+    "batch_adaptation",
+    BatchAdaptationResponse,
+    {"article", "size_limit", "targets"}
+)
+
+# Runs on the extended (web search) model, which is not asked for provider-side JSON
+ARTICLE_CREATION = register_prompt(
+    PromptService.get_article_creation_prompt(),
+    "generation",
+    ArticleResponse,
+    {"category", "date"},
+    structured_output=False
+)
+
+# Several distinct articles of one category from one web-search call on the extended model
+ARTICLE_BATCH_CREATION = register_prompt(
+    PromptService.get_article_batch_creation_prompt(),
+    "batch_generation",
+    ArticleListResponse,
+    {"category", "date", "count", "exclude_titles"},
+    structured_output=False
+)
+
+DIALOG_FOLLOW_UP = register_prompt(
+    PromptService.get_dialog_follow_up_prompt(),
+    "dialog",
+    DialogFollowUpResponseLLMSchema,
+    LANGUAGE_ARGUMENTS | set(DialogFollowUPRequestLLMSchema.model_fields)
+)
+
+DIALOG_SUMMARY = register_prompt(
+    PromptService.get_dialog_summary_prompt(),
+    "dialog_summary",
+    DialogSummaryLLMSchema,
+    {"main_language", "previousSummary", "newMessages"}
+)
@@ -1,61 +1,98 @@
 """Service for managing user article assignments using Supabase."""
-from typing import List, Dict, Any
-from supabase import Client
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from supabase import AsyncClient
 
 from app.services.article_generator import SimpleArticleService
-from app.services.dialogs import get_all_dialogs
 from app.schemas.articles import DiscoverArticleData
-from app.services import get_user_settings, article_adaptor
+from app.core.config import settings
+from app.services import get_user_settings, article_adaptor, near_duplicates
+from app.services.job_queue import ProgressCallback, job_handler
+
+
+def encode_discover_cursor(created_at: str, adopted_article_id: int) -> str:
+    """Opaque keyset cursor pointing just after the given assignment."""
+    raw = json.dumps([created_at, adopted_article_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_discover_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_discover_cursor. Raises ValueError for malformed cursors."""
+    try:
+        created_at, adopted_article_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at).isoformat(), int(adopted_article_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 
 class UserArticleService:
     """Service for handling user article generation and assignment with Supabase."""
     
-    def __init__(self, supabase: Client):
+    def __init__(self, supabase: AsyncClient):
         self.supabase = supabase
 
     async def get_user_assigned_articles(self, user_id: str, limit: int = 5, offset: int = 0) -> List[DiscoverArticleData]:
         """Get articles assigned to a specific user."""
+        articles, _ = await self.get_user_assigned_articles_page(user_id, limit=limit, offset=offset)
+        return articles
+
+    async def get_user_assigned_articles_page(
+        self, user_id: str, limit: int = 5, offset: int = 0, cursor: Optional[str] = None
+    ) -> Tuple[List[DiscoverArticleData], Optional[str]]:
+        """
+        Get a page of articles assigned to a user, newest first, plus the cursor of the next page
+        (None when this is the last page).
+
+        With `cursor` the page starts right after that assignment (keyset pagination on
+        (created_at, adopted_article_id)) and `offset` is ignored.
+        """
         
-        # Query to get user's assigned articles
-        response = self.supabase.table("user_x_adopted_article").select(
-            "adopted_article_id, created_at"
-        ).eq("user_id", user_id).order("created_at", desc=True).limit(limit).offset(offset).execute()
+        # One round-trip: the page of assignments with only the card columns of each adapted article
+        # and the user's dialogue for it (if any)
+        query = self.supabase.table("user_x_adopted_article").select(
+            "adopted_article_id, created_at, "
+            "adapted_articles(id, title, thumbnail_url, intro, dialogues(id))"
+        ).eq("user_id", user_id) \
+            .eq("adapted_articles.dialogues.user_id", user_id)
+
+        if cursor:
+            created_at, adopted_article_id = decode_discover_cursor(cursor)
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",adopted_article_id.lt.{adopted_article_id})'
+            )
+        else:
+            query = query.offset(offset)
+
+        response = await query.order("created_at", desc=True) \
+            .order("adopted_article_id", desc=True) \
+            .limit(limit).execute()
         
         if not response.data:
-            return []
-        
-        # Get the adapted articles details
-        article_ids = [row["adopted_article_id"] for row in response.data]
-        if not article_ids:
-            return []
-        
-        articles_response = self.supabase.table("adapted_articles").select(
-            "*"
-        ).in_("id", article_ids).execute()
-
-        # List[DialogResponse]
-        all_dialogs = await get_all_dialogs(self.supabase, user_id) if user_id else []
-        # Compile DiscoverArticleData from articles and dialogs
+            return [], None
 
         discover_articles = []
-        for article in articles_response.data or []:
-            #get the article object
-            article = article_adaptor.AdaptedArticleData.model_validate(article)
-            # Find matching dialog for the article
-            matching_dialog = next((dialog for dialog in all_dialogs if dialog.article.id == article.id), None)
-            # Create DiscoverArticleData entry
+        for row in response.data:
+            article = row.get("adapted_articles")
+            if not article:
+                continue
+            dialogues = article.get("dialogues") or []
             discover_article = DiscoverArticleData(
-                title=article.title,
-                thumbnail_url=article.thumbnail_url,
-                intro=article.intro,
-                adapted_article_id=article.id,
-                dialogue_id=matching_dialog.dialogId if matching_dialog else None,
-                created_at=None
+                title=article["title"],
+                thumbnail_url=article["thumbnail_url"],
+                intro=article["intro"],
+                adapted_article_id=article["id"],
+                dialogue_id=str(dialogues[0]["id"]) if dialogues else None,
+                created_at=row["created_at"]
             )
             discover_articles.append(discover_article)
 
-        return discover_articles
+        last = response.data[-1]
+        next_cursor = encode_discover_cursor(last["created_at"], last["adopted_article_id"]) if len(response.data) == limit else None
+        return discover_articles, next_cursor
 
     async def get_adapted_article_for_user_gt_id(self, last_id: int, count: int, language:str, level:str, categories:list[str] ) -> List[Dict[str, Any]]:
 
@@ -70,14 +107,16 @@ class UserArticleService:
             query = query.in_("category", categories)
 
 
-        adapted_response = query.gt("id", last_id).order("id", desc=False).limit(count).execute()
+        adapted_response = await query.gt("id", last_id).order("id", desc=False).limit(count).execute()
         if not adapted_response.data:
             return []
         return adapted_response.data
 
     
-    async def generate_and_assign_articles(self, user_id: str, count: int = 3) -> List[Dict[str, Any]]:
-        """Generate and assign new articles to a user."""
+    async def generate_and_assign_articles(
+        self, user_id: str, count: int = 3, progress: Optional[ProgressCallback] = None
+    ) -> List[Dict[str, Any]]:
+        """Generate and assign new articles to a user. `progress` is awaited with the name of each step."""
 
         user_preferences = await get_user_settings(self.supabase, user_id) if user_id else None
 
@@ -86,16 +125,17 @@ class UserArticleService:
         level = user_preferences.language_level if user_preferences else None
         main_language = user_preferences.main_language if user_preferences else None
         
-        # Get the last assigned article ID for this user
-        last_response = self.supabase.table("user_x_adopted_article").select(
+        # Get the last assigned article ID for this user, and the user's recent articles for near-duplicate checks
+        last_response = await self.supabase.table("user_x_adopted_article").select(
             "adopted_article_id", "original_article_id"
-        ).eq("user_id", user_id).order("adopted_article_id", desc=True).limit(1).execute()
+        ).eq("user_id", user_id).order("adopted_article_id", desc=True).limit(settings.near_duplicate_user_history).execute()
         
         last_adapted_article_id = 0
         last_original_article_id = 0
         if last_response.data:
             last_adapted_article_id = last_response.data[0]["adopted_article_id"]
             last_original_article_id = last_response.data[0]["original_article_id"]
+        seen_original_ids = [row["original_article_id"] for row in last_response.data or []]
 
         adapted_articles_ready_to_assign = await self.get_adapted_article_for_user_gt_id(
             last_id=last_adapted_article_id,
@@ -110,62 +150,98 @@ class UserArticleService:
         #the articles to assign that are have ID greater than last_id that user have
         #articles_to_assign = adapted_response.data or []
         #here we have IDs of articles to assign as a plain list
+        # (without near-duplicates of the user's recent articles; the watermark still moves past them)
+        kept_original_ids = set(await near_duplicates.drop_near_duplicates(
+            self.supabase,
+            [article["original_article_id"] for article in adapted_articles_ready_to_assign],
+            seen_original_ids
+        ))
         articles_id_pairs_to_assign = [
             {"id": article["id"], "original_article_id": article["original_article_id"]}
             for article in adapted_articles_ready_to_assign
+            if article["original_article_id"] in kept_original_ids
         ]
 
         # If we need more articles, create new adapted articles
-        if len(adapted_articles_ready_to_assign) < count:
+        if len(articles_id_pairs_to_assign) < count:
             # we need to add at least need_count articles
-            needed_count = count - len(adapted_articles_ready_to_assign)
+            needed_count = count - len(articles_id_pairs_to_assign)
 
             # get the last element from articles_to_assign list and get the original_article_id from there
             last_article_id = adapted_articles_ready_to_assign[-1]["original_article_id"] if len(adapted_articles_ready_to_assign) > 0 else last_original_article_id
 
             # Find new articles to adapt
-            articles_to_adapt = self.supabase.table("articles").select(
+            articles_to_adapt = await self.supabase.table("articles").select(
                 "id"
             ).gt("id", last_article_id).in_("category", categories).order("id", desc=False).limit(needed_count).execute()
 
             #If there are no new articles, we need to create some
             ids_to_adapt = [article["id"] for article in articles_to_adapt.data] if articles_to_adapt.data else []
-            if not articles_to_adapt.data or len(articles_to_adapt.data) < needed_count:
-                article_generator = SimpleArticleService()
-                new_articles_ids = await article_generator.generate_articles_for_categories(
-                    categories=categories,
-                    user_id=user_id,
-                    supabase_client=self.supabase,
-                    limit=needed_count
-                )
-                ids_to_adapt.extend(new_articles_ids)
+            # Don't spend an adaptation on a repeat of a story the user already has
+            ids_to_adapt = await near_duplicates.drop_near_duplicates(
+                self.supabase,
+                ids_to_adapt,
+                seen_original_ids + [id_pair["original_article_id"] for id_pair in articles_id_pairs_to_assign]
+            )
+            article_generator = SimpleArticleService()
 
-            
-            # For each new article, create adapted version (simplified)
-            for article in ids_to_adapt or []:
-                adapted_article = await article_adaptor.adapt_article(
-                    article_id=article,
+            async def adapt(article_id: int):
+                return await article_adaptor.adapt_article(
+                    article_id=article_id,
                     language_level=level,
                     initial_lang=main_language,
                     target_lang=language,
                     supabase=self.supabase
                 )
+
+            async def generate_and_adapt(category: str):
+                article_ids = await article_generator.generate_and_store_articles(
+                    category, needed_count, user_id, self.supabase
+                )
+                return await asyncio.gather(*(adapt(article_id) for article_id in article_ids))
+
+            # Existing articles are adapted while each category's articles are generated in one batch, then
+            # adapted; the LLM limiter caps concurrency
+            generate = len(ids_to_adapt) < needed_count
+            if progress:
+                await progress("generating" if generate else "adapting")
+            adapted_articles = list(await asyncio.gather(*(adapt(article_id) for article_id in ids_to_adapt)))
+            if generate:
+                for generated in await asyncio.gather(*(generate_and_adapt(category) for category in categories)):
+                    adapted_articles.extend(generated)
+
+            for adapted_article in adapted_articles:
                 articles_id_pairs_to_assign.append({"id": adapted_article.id, "original_article_id": adapted_article.original_article_id})
         
-        # Assign articles to user
-        assigned_articles = []
-        for id_pair in articles_id_pairs_to_assign[:count]:
-
-            # Assign article to user
-            self.supabase.table("user_x_adopted_article").insert({
+        # Assign articles to user: one bulk upsert; rows a concurrent request already assigned are skipped
+        # by the unique (user_id, adopted_article_id) key instead of being assigned twice
+        if progress:
+            await progress("assigning")
+        rows = {}
+        for id_pair in articles_id_pairs_to_assign:
+            rows.setdefault(id_pair["id"], {
                 "user_id": user_id,
                 "adopted_article_id": id_pair["id"],
                 "original_article_id": id_pair["original_article_id"]
-            }).execute()
-
-            assigned_articles.append({
-                "id": id_pair["id"],
             })
-        
-        return assigned_articles
-
+        rows = list(rows.values())[:count]
+        if rows:
+            await self.supabase.table("user_x_adopted_article").upsert(
+                rows,
+                on_conflict="user_id,adopted_article_id",
+                ignore_duplicates=True
+            ).execute()
+
+        return [{"id": row["adopted_article_id"]} for row in rows]
+
+
+@job_handler("generate_articles")
+async def generate_articles_job(supabase: AsyncClient, job: Dict[str, Any], progress: ProgressCallback) -> Dict[str, Any]:
+    """Background job: generate and assign articles for the job's user."""
+    service = UserArticleService(supabase)
+    articles = await service.generate_and_assign_articles(
+        user_id=job["user_id"],
+        count=job["params"].get("count", 3),
+        progress=progress
+    )
+    return {"articles": articles}
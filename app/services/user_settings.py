@@ -1,13 +1,27 @@
 from typing import Optional
-from supabase import Client
+from supabase import AsyncClient
+from app.core.cache import TTLCache
+from app.core.config import settings as app_settings
 from app.schemas.user_settings import UserSettingsCreate, UserSettingsUpdate, UserSettingsInDB
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Settings rows by user_id. Only found rows are cached, so a user who has just created
+# settings is never served a stale "not found".
+_settings_cache = TTLCache(
+    max_size=app_settings.user_settings_cache_max_size,
+    ttl=app_settings.user_settings_cache_ttl
+)
+
+
+def user_settings_cache_stats() -> dict:
+    """Size and hit/miss counters of the user settings cache."""
+    return _settings_cache.stats()
+
 #Reviewed. finished.
 async def create_user_settings(
-    supabase: Client,
+    supabase: AsyncClient,
     user_id: str,
     settings: UserSettingsCreate
 ) -> UserSettingsInDB:
@@ -36,12 +50,14 @@ async def create_user_settings(
         }
         
         # Insert into database
-        response = supabase.table("user_settings").insert(settings_data).execute()
+        response = await supabase.table("user_settings").insert(settings_data).execute()
         
         if not response.data:
             raise Exception("Failed to create user settings")
             
-        return UserSettingsInDB(**response.data[0])
+        created = UserSettingsInDB(**response.data[0])
+        _settings_cache.set(user_id, created)
+        return created
         
     except Exception as e:
         logger.error(f"Error creating user settings: {str(e)}")
@@ -49,7 +65,7 @@ async def create_user_settings(
 
 
 async def get_user_settings(
-    supabase: Client,
+    supabase: AsyncClient,
     user_id: str
 ) -> Optional[UserSettingsInDB]:
     """
@@ -65,8 +81,12 @@ async def get_user_settings(
     Raises:
         Exception: If query fails
     """
+    cached = _settings_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     try:
-        response = supabase.table("user_settings") \
+        response = await supabase.table("user_settings") \
             .select("*") \
             .eq("user_id", user_id) \
             .maybe_single() \
@@ -75,7 +95,9 @@ async def get_user_settings(
         if not response:
             return None
             
-        return UserSettingsInDB(**response.data)
+        user_settings = UserSettingsInDB(**response.data)
+        _settings_cache.set(user_id, user_settings)
+        return user_settings
         
     except Exception as e:
         logger.error(f"Error retrieving user settings: {str(e)}")
@@ -83,7 +105,7 @@ async def get_user_settings(
 
 
 async def update_user_settings(
-    supabase: Client,
+    supabase: AsyncClient,
     user_id: str,
     settings_update: UserSettingsUpdate
 ) -> Optional[UserSettingsInDB]:
@@ -111,7 +133,8 @@ async def update_user_settings(
         if not update_data:
             return await get_user_settings(supabase, user_id)
         
-        response = supabase.table("user_settings") \
+        _settings_cache.pop(user_id)
+        response = await supabase.table("user_settings") \
             .update(update_data) \
             .eq("user_id", user_id) \
             .execute()
@@ -119,7 +142,9 @@ async def update_user_settings(
         if not response.data:
             return None
             
-        return UserSettingsInDB(**response.data[0])
+        updated = UserSettingsInDB(**response.data[0])
+        _settings_cache.set(user_id, updated)
+        return updated
         
     except Exception as e:
         logger.error(f"Error updating user settings: {str(e)}")
@@ -127,7 +152,7 @@ async def update_user_settings(
 
 
 async def delete_user_settings(
-    supabase: Client,
+    supabase: AsyncClient,
     user_id: str
 ) -> bool:
     """
@@ -144,10 +169,11 @@ async def delete_user_settings(
         Exception: If deletion fails
     """
     try:
-        response = supabase.table("user_settings") \
+        response = await supabase.table("user_settings") \
             .delete() \
             .eq("user_id", user_id) \
             .execute()
+        _settings_cache.pop(user_id)
             
         return bool(response.data)
         
@@ -157,7 +183,7 @@ async def delete_user_settings(
 
 
 async def ensure_user_settings_exists(
-    supabase: Client,
+    supabase: AsyncClient,
     user_id: str
 ) -> UserSettingsInDB:
     """
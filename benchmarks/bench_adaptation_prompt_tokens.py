@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Input tokens to adapt one source article into N (language, level) targets: one call per target vs. batch adaptation.
+
+Renders the real adaptation prompts for a ~1000 word article and counts their tokens, no LLM needed:
+    python benchmarks/bench_adaptation_prompt_tokens.py
+"""
+import standin  # noqa: F401  (sets the env defaults Settings needs)
+
+import json
+import math
+
+from app.core.config import settings
+from app.schemas.admin import BatchAdaptationTarget
+from app.services.article_adaptor import split_batches
+from app.services.dialog_context import count_tokens
+from app.services.prompt_registry import ARTICLE_ADAPTATION, ARTICLE_BATCH_ADAPTATION
+
+ARTICLE = "The city plans new cycle lanes along the river to take traffic out of the centre. " * 65
+TARGETS = [
+    ("German", "A2", "English"), ("German", "B1", "English"), ("German", "B2", "Russian"),
+    ("French", "A2", "English"), ("French", "B1", "English"), ("Spanish", "B1", "English"),
+]
+
+
+def tokens(prompt, model_name: str, **prompt_args) -> int:
+    messages = prompt.template.format_messages(**prompt_args)
+    return sum(count_tokens(message.content, model_name) for message in messages)
+
+
+def single_calls(targets, model_name: str) -> int:
+    return sum(
+        tokens(
+            ARTICLE_ADAPTATION, model_name,
+            article=ARTICLE, size_limit=250, learning_language=target_lang, lang_level=level, main_language=initial_lang
+        )
+        for target_lang, level, initial_lang in targets
+    )
+
+
+def batched_calls(targets, model_name: str, batch_size: int) -> int:
+    if len(targets) == 1:
+        # adapt_article_batch uses the single-target prompt for one target
+        return single_calls(targets, model_name)
+    total = 0
+    for batch_targets in split_batches(targets, batch_size):
+        batch = [
+            BatchAdaptationTarget(targetLanguage=target_lang, targetLevel=level, translationLanguage=initial_lang).model_dump()
+            for target_lang, level, initial_lang in batch_targets
+        ]
+        total += tokens(ARTICLE_BATCH_ADAPTATION, model_name, article=ARTICLE, size_limit=250, targets=json.dumps(batch))
+    return total
+
+
+def main():
+    model_name = settings.openrouter_model_name
+    batch_size = settings.adaptation_batch_size
+    print(f"batch size {batch_size}")
+    print(f"{'targets':>7} {'calls':>6} {'per target':>11} {'batched':>8} {'saved':>6}")
+    for count in range(1, len(TARGETS) + 1):
+        single = single_calls(TARGETS[:count], model_name)
+        batched = batched_calls(TARGETS[:count], model_name, batch_size)
+        calls = math.ceil(count / batch_size)
+        print(f"{count:>7} {calls:>6} {single:>11} {batched:>8} {1 - batched / single:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Follow-up prompt size vs. dialogue length: full history vs. rolling summary + recent messages.
+
+Renders the real follow-up prompt for synthetic dialogues and counts its tokens, no LLM needed:
+    python benchmarks/bench_dialog_prompt_tokens.py
+"""
+import standin  # noqa: F401  (sets the env defaults Settings needs)
+
+from app.core.config import settings
+from app.schemas.dialogs import DialogFollowUPRequestLLMSchema, SimpleMessage
+from app.services.dialog_context import build_history, count_tokens, messages_to_summarise
+from app.services.prompt_registry import DIALOG_FOLLOW_UP
+
+ARTICLE = "Die Stadt plant neue Radwege entlang des Flusses, um den Verkehr im Zentrum zu entlasten. " * 30
+USER_TEXT = "Ich finde, dass die Radwege eine gute Idee sind, weil viele Leute mit dem Fahrrad zur Arbeit fahren."
+AI_TEXT = "Interessant! Fährst du selbst oft mit dem Fahrrad, und was würde dich motivieren, es öfter zu tun?"
+# A summary is capped at ~150 words by its prompt
+SUMMARY = " ".join(["word"] * 150)
+LENGTHS = [10, 20, 50, 100, 200]
+
+
+def dialogue(length: int):
+    return [
+        SimpleMessage(sender="User" if i % 2 else "AI", text=USER_TEXT if i % 2 else AI_TEXT)
+        for i in range(length)
+    ]
+
+
+def prompt_tokens(history, model_name: str) -> int:
+    request = DialogFollowUPRequestLLMSchema(
+        article=ARTICLE,
+        dialogHistory=history,
+        lastUserMessage=USER_TEXT,
+        vocabulary=[],
+        grammarTopics=[]
+    )
+    messages = DIALOG_FOLLOW_UP.template.format_messages(
+        **request.dict(),
+        lang_level="B1",
+        main_language="English",
+        learning_language="German"
+    )
+    return sum(count_tokens(message.content, model_name) for message in messages)
+
+
+def bounded_history(messages, model_name: str):
+    # Steady state after the background summary updates: only the unsummarised tail remains
+    folded = messages_to_summarise(len(messages))
+    summary = SUMMARY if folded else None
+    return build_history(summary, messages[folded:], model_name)
+
+
+def main():
+    model_name = settings.openrouter_model_name
+    print(f"{'messages':>8} {'full history':>13} {'bounded':>8}")
+    for length in LENGTHS:
+        messages = dialogue(length)
+        full = prompt_tokens(messages, model_name)
+        bounded = prompt_tokens(bounded_history(messages, model_name), model_name)
+        print(f"{length:>8} {full:>13} {bounded:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+N parallel GET /api/v2/articles/discover calls against a local PostgREST stand-in.
+
+Each stand-in query sleeps for DB_DELAY seconds. If the data layer blocked the event loop the
+wall-clock time would be roughly N x the single-call latency; with async queries it stays close
+to the single-call latency.
+    python benchmarks/bench_discover_concurrency.py
+"""
+import asyncio
+import time
+
+from standin import make_token, start_standin
+
+import httpx
+
+from app.core.config import settings
+from app.core.db import close_supabase_pool
+from app.main import app
+
+DB_DELAY = 0.05
+PARALLEL = 50
+
+
+async def discover(client: httpx.AsyncClient, headers: dict) -> None:
+    response = await client.get(f"{settings.api_v2_str}/articles/discover", headers=headers)
+    response.raise_for_status()
+
+
+async def run() -> None:
+    headers = {"Authorization": f"Bearer {make_token(settings.supabase_jwt_secret)}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await discover(client, headers)  # warm-up (pool, auth cache)
+
+        start = time.perf_counter()
+        await discover(client, headers)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(discover(client, headers) for _ in range(PARALLEL)))
+        parallel = time.perf_counter() - start
+    await close_supabase_pool()
+
+    print(f"single /discover:              {single * 1000:.1f} ms")
+    print(f"{PARALLEL} parallel /discover:        {parallel * 1000:.1f} ms")
+    print(f"serialised would be about:     {single * PARALLEL * 1000:.1f} ms")
+
+
+def main():
+    server = start_standin(delay=DB_DELAY)
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of the MinHash near-duplicate index on synthetic articles, no database needed:
+    python benchmarks/bench_near_duplicates.py
+
+Each base article (~1000 words) gets variants with a share of its words replaced. Recall is the share of
+variants whose base is found at the configured threshold; false positives are unrelated articles found.
+"""
+import standin  # noqa: F401  (sets the env defaults Settings needs)
+
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.services.near_duplicates import NearDuplicateIndex, signature, similarity
+
+VOCABULARY = [f"w{i}" for i in range(20000)]
+ARTICLE_WORDS = 1000
+BASE_ARTICLES = 2000
+EDIT_RATES = [0.05, 0.1, 0.2, 0.3, 0.4]
+VARIANTS = 100
+
+
+def article(rng: random.Random) -> list:
+    return rng.choices(VOCABULARY, k=ARTICLE_WORDS)
+
+
+def variant(words: list, edit_rate: float, rng: random.Random) -> list:
+    words = list(words)
+    for i in rng.sample(range(len(words)), int(len(words) * edit_rate)):
+        words[i] = rng.choice(VOCABULARY)
+    return words
+
+
+def main():
+    rng = random.Random(7)
+    threshold = settings.near_duplicate_threshold
+    bases = [article(rng) for _ in range(BASE_ARTICLES)]
+
+    started = time.perf_counter()
+    signatures = [signature(" ".join(words)) for words in bases]
+    per_signature_ms = (time.perf_counter() - started) / len(bases) * 1000
+
+    index = NearDuplicateIndex(threshold)
+    for article_id, sig in enumerate(signatures):
+        index.add(article_id, sig)
+
+    print(f"{len(bases)} indexed articles, threshold {threshold}, signature {per_signature_ms:.2f} ms/article")
+    print(f"{'edited':>6} {'jaccard':>8} {'recall':>7} {'query ms':>9} {'brute ms':>9}")
+    for edit_rate in EDIT_RATES:
+        found, query_times, brute_times, estimates = 0, [], [], []
+        for _ in range(VARIANTS):
+            base_id = rng.randrange(len(bases))
+            sig = signature(" ".join(variant(bases[base_id], edit_rate, rng)))
+            estimates.append(similarity(sig, signatures[base_id]))
+
+            started = time.perf_counter()
+            matches = index.query(sig)
+            query_times.append(time.perf_counter() - started)
+            found += any(article_id == base_id for article_id, _ in matches)
+
+            started = time.perf_counter()
+            [similarity(sig, other) for other in signatures]
+            brute_times.append(time.perf_counter() - started)
+        print(
+            f"{edit_rate:>6.0%} {statistics.mean(estimates):>8.2f} {found / VARIANTS:>7.0%} "
+            f"{statistics.median(query_times) * 1000:>9.3f} {statistics.median(brute_times) * 1000:>9.3f}"
+        )
+
+    false_positives = sum(bool(index.query(signature(" ".join(article(rng))))) for _ in range(VARIANTS))
+    print(f"false positives on unrelated articles: {false_positives}/{VARIANTS}")
+
+
+if __name__ == "__main__":
+    main()
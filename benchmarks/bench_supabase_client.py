@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Per-request Supabase client overhead: create_client per request vs. the shared pool.
+
+Runs against a local PostgREST stand-in, so no real Supabase project is needed:
+    python benchmarks/bench_supabase_client.py
+"""
+import asyncio
+import time
+
+from standin import make_token, start_standin
+
+from supabase import create_client
+
+from app.core.config import settings
+from app.core.db import close_supabase_pool, get_supabase_pool
+
+
+def per_request_client(token: str):
+    client = create_client(settings.supabase_url, settings.supabase_anon_key)
+    client.auth.set_session(access_token=token, refresh_token=token)
+    client.table("user_settings").select("*").execute()
+
+
+async def pooled_client(token: str):
+    pool = get_supabase_pool()
+    await pool.auth.get_user(token)
+    await pool.for_user(token).table("user_settings").select("*").execute()
+
+
+def measure_sync(token: str, iterations: int) -> float:
+    per_request_client(token)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        per_request_client(token)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+async def measure_pooled(token: str, iterations: int) -> float:
+    await pooled_client(token)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await pooled_client(token)
+    elapsed = (time.perf_counter() - start) / iterations * 1000
+    await close_supabase_pool()
+    return elapsed
+
+
+def main(iterations: int = 200):
+    server = start_standin()
+    token = make_token(settings.supabase_jwt_secret)
+    try:
+        before = measure_sync(token, iterations)
+        after = asyncio.run(measure_pooled(token, iterations))
+    finally:
+        server.shutdown()
+
+    print(f"create_client per request: {before:.3f} ms/request")
+    print(f"shared pool view:          {after:.3f} ms/request")
+    print(f"speed-up:                  {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Local PostgREST/GoTrue stand-in shared by the benchmark scripts."""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HOST, PORT = "127.0.0.1", 8765
+
+# Settings are read at import time, so these must be set before importing app modules
+os.environ.setdefault("SUPABASE_URL", f"http://{HOST}:{PORT}")
+os.environ.setdefault("SUPABASE_ANON_KEY", "anon")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+os.environ.setdefault("PROJECT_NAME", "bench")
+os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+os.environ.setdefault("OPENROUTER_MODEL_NAME", "bench")
+
+USER_JSON = (
+    b'{"id": "bench-user", "aud": "authenticated", "app_metadata": {}, '
+    b'"user_metadata": {}, "created_at": "2024-01-01T00:00:00Z"}'
+)
+
+
+def make_token(secret: str, user_id: str = "bench-user") -> str:
+    import jwt
+
+    return jwt.encode(
+        {"sub": user_id, "aud": "authenticated", "exp": int(time.time()) + 3600},
+        secret,
+        algorithm="HS256",
+    )
+
+
+def start_standin(delay: float = 0.0, routes: dict = None) -> ThreadingHTTPServer:
+    """
+    Serve GoTrue /auth/v1/user and PostgREST tables on HOST:PORT in a background thread.
+
+    `delay` simulates the database round-trip; `routes` maps a table name to a JSON body (default `[]`).
+    """
+    routes = routes or {}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            if self.path.startswith("/auth/v1/user"):
+                body = USER_JSON
+            else:
+                time.sleep(delay)
+                table = self.path.split("?")[0].rsplit("/", 1)[-1]
+                body = routes.get(table, b"[]")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PATCH = do_DELETE = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((HOST, PORT), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
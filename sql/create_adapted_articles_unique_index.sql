@@ -0,0 +1,73 @@
+-- One adaptation per (source article, language, level), shared by all users.
+-- Every adaptation used to insert a new row, so existing duplicates are merged into the lowest id of each
+-- group first: assignments and dialogues are pointed at that row, then the other rows are deleted.
+-- Run after create_get_dialog_context.sql (it resets the summary columns of merged dialogues).
+BEGIN;
+
+CREATE TEMP TABLE adapted_articles_merge ON COMMIT DROP AS
+SELECT id AS duplicate_id, keep_id
+FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY original_article_id, language, level) AS keep_id
+    FROM adapted_articles
+) grouped
+WHERE id <> keep_id;
+
+-- A user assigned several rows of a group keeps one assignment: the one of the kept row if any, else the first
+DELETE FROM user_x_adopted_article a
+    USING adapted_articles_merge m
+    WHERE a.adopted_article_id = m.duplicate_id
+      AND EXISTS (
+          SELECT 1
+          FROM user_x_adopted_article b
+          LEFT JOIN adapted_articles_merge mb ON mb.duplicate_id = b.adopted_article_id
+          WHERE b.user_id = a.user_id
+            AND COALESCE(mb.keep_id, b.adopted_article_id) = m.keep_id
+            AND (b.adopted_article_id = m.keep_id OR (mb.duplicate_id IS NOT NULL AND b.ctid < a.ctid))
+      );
+
+UPDATE user_x_adopted_article a
+    SET adopted_article_id = m.keep_id
+    FROM adapted_articles_merge m
+    WHERE a.adopted_article_id = m.duplicate_id;
+
+-- A user with dialogues on several rows of a group keeps one dialogue (the one on the kept row if any, else
+-- the oldest) holding all their messages; its summary is rebuilt from scratch
+CREATE TEMP TABLE dialogues_merge ON COMMIT DROP AS
+SELECT id AS duplicate_id, keep_dialogue_id
+FROM (
+    SELECT d.id, FIRST_VALUE(d.id) OVER (
+        PARTITION BY d.user_id, COALESCE(m.keep_id, d.adapted_article_id)
+        ORDER BY m.duplicate_id IS NOT NULL, d.created_at, d.id
+    ) AS keep_dialogue_id
+    FROM dialogues d
+    LEFT JOIN adapted_articles_merge m ON m.duplicate_id = d.adapted_article_id
+    WHERE d.adapted_article_id IN (
+        SELECT duplicate_id FROM adapted_articles_merge
+        UNION
+        SELECT keep_id FROM adapted_articles_merge
+    )
+) grouped
+WHERE id <> keep_dialogue_id;
+
+UPDATE messages
+    SET dialogue_id = dm.keep_dialogue_id
+    FROM dialogues_merge dm
+    WHERE messages.dialogue_id = dm.duplicate_id;
+
+UPDATE dialogues
+    SET summary = NULL, summary_message_count = 0
+    WHERE id IN (SELECT keep_dialogue_id FROM dialogues_merge);
+
+DELETE FROM dialogues WHERE id IN (SELECT duplicate_id FROM dialogues_merge);
+
+UPDATE dialogues d
+    SET adapted_article_id = m.keep_id
+    FROM adapted_articles_merge m
+    WHERE d.adapted_article_id = m.duplicate_id;
+
+DELETE FROM adapted_articles WHERE id IN (SELECT duplicate_id FROM adapted_articles_merge);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_adapted_articles_source_language_level
+    ON adapted_articles(original_article_id, language, level);
+
+COMMIT;
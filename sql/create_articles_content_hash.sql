@@ -0,0 +1,5 @@
+-- Content hash of generated articles (normalised text + day it was stored, see article_generator.content_hash).
+-- Bulk inserts upsert on it with ON CONFLICT DO NOTHING, so an article produced twice on one day is stored once.
+-- Rows stored before this column existed keep NULL, which never conflicts.
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_articles_content_hash ON articles(content_hash);
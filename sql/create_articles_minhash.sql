@@ -0,0 +1,7 @@
+-- MinHash signature of articles.original_text (base64 of 128 little-endian uint32, see app/services/near_duplicates.py).
+-- Written when generated articles are stored; articles without one are never treated as near-duplicates.
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS minhash TEXT;
+
+-- Loading a category's recent signatures into the near-duplicate index
+CREATE INDEX IF NOT EXISTS idx_articles_category_created_at ON articles(category, created_at)
+    WHERE minhash IS NOT NULL;
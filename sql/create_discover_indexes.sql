@@ -0,0 +1,6 @@
+-- Indexes backing the embedded discover feed select (user_x_adopted_article -> adapted_articles -> dialogues)
+CREATE INDEX IF NOT EXISTS idx_dialogues_adapted_article_user ON dialogues(adapted_article_id, user_id);
+
+-- Keyset pagination of /articles/discover: WHERE user_id = ? AND (created_at, adopted_article_id) < cursor
+CREATE INDEX IF NOT EXISTS idx_user_x_adopted_article_user_created
+    ON user_x_adopted_article(user_id, created_at DESC, adopted_article_id DESC);
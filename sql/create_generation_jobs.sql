@@ -0,0 +1,33 @@
+-- Create generation_jobs table for background article generation/adaptation jobs
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+    progress TEXT,
+    result JSONB,
+    error TEXT,
+    idempotency_key TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Users can create, read and update (progress reporting) only their own jobs
+ALTER TABLE generation_jobs ENABLE ROW LEVEL SECURITY;
+CREATE POLICY generation_jobs_owner ON generation_jobs
+    FOR ALL USING (auth.uid() = user_id) WITH CHECK (auth.uid() = user_id);
+
+-- Create index for performance
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_user_id ON generation_jobs(user_id);
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_unfinished ON generation_jobs(created_at) WHERE status IN ('queued', 'running');
+
+-- Idempotency-Key of POST /articles/generate: one job per key and user (NULL keys never conflict)
+ALTER TABLE generation_jobs ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generation_jobs_user_idempotency_key
+    ON generation_jobs(user_id, idempotency_key);
+
+-- At most one queued or running job per user and kind: concurrent POST /articles/generate calls share one job
+-- instead of each generating (and assigning) a new set of articles
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generation_jobs_active_kind
+    ON generation_jobs(user_id, kind) WHERE status IN ('queued', 'running');
@@ -0,0 +1,39 @@
+-- Rolling summary of older messages, maintained by the backend (see app/services/dialog_context.py).
+-- summary_message_count = number of oldest messages (by created_at) already folded into summary.
+ALTER TABLE dialogues ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE dialogues ADD COLUMN IF NOT EXISTS summary_message_count INTEGER NOT NULL DEFAULT 0;
+
+-- Everything a dialog turn needs in one round-trip: the dialogue (only if owned by p_user_id),
+-- the adapted article text, the summary, the ordered not-yet-summarised messages and the user's settings.
+-- Returns NULL when the dialogue does not exist or belongs to someone else.
+-- SECURITY INVOKER, so the caller's RLS policies still apply.
+CREATE OR REPLACE FUNCTION get_dialog_context(p_dialog_id dialogues.id%TYPE, p_user_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT jsonb_build_object(
+        'dialogue_id', d.id,
+        'adapted_article_id', d.adapted_article_id,
+        'adapted_text', a.adapted_text,
+        'summary', d.summary,
+        'summary_message_count', d.summary_message_count,
+        'messages', COALESCE(
+            (SELECT jsonb_agg(
+                        jsonb_build_object('speaker', m.speaker, 'text', m.content->>'text')
+                        ORDER BY m.created_at
+                    )
+             FROM (SELECT speaker, content, created_at
+                   FROM messages
+                   WHERE dialogue_id = d.id
+                   ORDER BY created_at
+                   OFFSET d.summary_message_count) m),
+            '[]'::jsonb
+        ),
+        'settings', (SELECT to_jsonb(s) FROM user_settings s WHERE s.user_id = d.user_id)
+    )
+    FROM dialogues d
+    JOIN adapted_articles a ON a.id = d.adapted_article_id
+    WHERE d.id = p_dialog_id AND d.user_id = p_user_id;
+$$;
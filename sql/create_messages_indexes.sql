@@ -0,0 +1,4 @@
+-- Ordered, paginated message reads: WHERE dialogue_id = ? ORDER BY created_at, id (both directions),
+-- used by get_dialog_context, GET /dialogs/{article_id} and GET /dialogs/{dialog_id}/messages
+CREATE INDEX IF NOT EXISTS idx_messages_dialogue_created
+    ON messages(dialogue_id, created_at, id);
@@ -0,0 +1,11 @@
+-- An adapted article is assigned to a user at most once, so concurrent POST /articles/generate calls
+-- can upsert the same assignment (ON CONFLICT DO NOTHING) instead of duplicating it.
+-- Remove existing duplicates, keeping the first assignment, before creating the index.
+DELETE FROM user_x_adopted_article a
+    USING user_x_adopted_article b
+    WHERE a.user_id = b.user_id
+      AND a.adopted_article_id = b.adopted_article_id
+      AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_x_adopted_article_user_article
+    ON user_x_adopted_article(user_id, adopted_article_id);
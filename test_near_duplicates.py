@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Test script to validate the MinHash near-duplicate detection
+without requiring actual database connections.
+"""
+
+import asyncio
+import random
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Settings are read at import time; these only need to exist
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "anon")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "secret")
+os.environ.setdefault("PROJECT_NAME", "langhub")
+os.environ.setdefault("OPENROUTER_API_KEY", "key")
+os.environ.setdefault("OPENROUTER_MODEL_NAME", "model")
+
+_words = [f"word{i}" for i in range(2000)]
+
+
+def _article(seed, length=300):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_words) for _ in range(length))
+
+
+def _edited(text, changes=5):
+    words = text.split()
+    for position in range(0, len(words), len(words) // changes)[:changes]:
+        words[position] = "edited"
+    return " ".join(words)
+
+
+class _FakeQuery:
+    """Answers the select of drop_near_duplicates: rows with a minhash whose id is in the in_ filter."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._ids = None
+        self.not_ = self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def in_(self, column, values):
+        self._ids = set(values)
+        return self
+
+    def is_(self, column, value):
+        return self
+
+    async def execute(self):
+        class Response:
+            data = [row for row in self._rows if row["id"] in self._ids and row["minhash"] is not None]
+        return Response()
+
+
+class _FakeSupabase:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def table(self, name):
+        return _FakeQuery(self._rows)
+
+
+def test_signature():
+    """Test signatures, their encoding and the similarity estimate."""
+    try:
+        from app.core.config import settings
+        from app.services.near_duplicates import (
+            NUM_PERM,
+            decode_signature,
+            encode_signature,
+            signature,
+            similarity
+        )
+
+        text = _article(1)
+        sig = signature(text)
+        if sig.shape != (NUM_PERM,) or str(sig.dtype) != "uint32":
+            print(f"❌ Unexpected signature shape {sig.shape} or dtype {sig.dtype}")
+            return False
+        if not (signature(text) == sig).all():
+            print("❌ Signature of the same text differs between calls")
+            return False
+        if not (decode_signature(encode_signature(sig)) == sig).all():
+            print("❌ Signature does not survive encode/decode")
+            return False
+        print("✅ Signatures are stable and survive encode/decode")
+
+        same_case = similarity(sig, signature(text.upper()))
+        edited = similarity(sig, signature(_edited(text)))
+        unrelated = similarity(sig, signature(_article(2)))
+        print(f"   Similarity: upper-cased {same_case:.2f}, edited {edited:.2f}, unrelated {unrelated:.2f}")
+        if same_case != 1.0 or edited < settings.near_duplicate_threshold or unrelated >= settings.near_duplicate_threshold:
+            print("❌ Similarity estimate does not separate near-duplicates from unrelated articles")
+            return False
+        print("✅ Similarity separates near-duplicates from unrelated articles")
+        return True
+    except Exception as e:
+        print(f"❌ Signature error: {e}")
+        return False
+
+
+def test_banding():
+    """Test LSH banding of the index: candidates, removal and eviction."""
+    try:
+        from datetime import datetime, timedelta, timezone
+        from app.services.near_duplicates import BANDS, NUM_PERM, ROWS, NearDuplicateIndex, signature
+
+        if BANDS * ROWS != NUM_PERM:
+            print(f"❌ {BANDS} bands of {ROWS} rows do not cover {NUM_PERM} positions")
+            return False
+
+        now = datetime.now(timezone.utc)
+        index = NearDuplicateIndex(0.5)
+        index.add(1, signature(_article(1)), now - timedelta(days=30))
+        index.add(2, signature(_article(2)), now)
+        index.add(2, signature(_article(3)), now)
+
+        if len(index) != 2:
+            print(f"❌ Index holds {len(index)} articles, expected 2")
+            return False
+        if index.find_duplicate(signature(_edited(_article(1)))) != 1:
+            print("❌ Near-duplicate not found through the bands")
+            return False
+        if index.query(signature(_article(4))):
+            print("❌ Unrelated article matched")
+            return False
+        print("✅ Banding finds near-duplicates and ignores unrelated articles")
+
+        index.evict_before(now - timedelta(days=14))
+        if len(index) != 1 or index.find_duplicate(signature(_article(1))) is not None:
+            print("❌ Article created before the cutoff was not evicted")
+            return False
+        index.remove(2)
+        if len(index) != 0 or any(index._buckets):
+            print("❌ Removed article left bucket entries behind")
+            return False
+        print("✅ Eviction and removal empty the bands")
+        return True
+    except Exception as e:
+        print(f"❌ Banding error: {e}")
+        return False
+
+
+def test_drop_near_duplicates():
+    """Test that drop_near_duplicates keeps candidate order and drops only near-duplicates."""
+    try:
+        from app.services.near_duplicates import drop_near_duplicates, encode_signature, signature
+
+        texts = {
+            9: _article(9),
+            3: _article(3),
+            1: _article(1),
+            4: _edited(_article(3)),
+            2: _edited(_article(9)),
+            5: _article(5),
+        }
+        rows = [{"id": article_id, "minhash": encode_signature(signature(text))} for article_id, text in texts.items()]
+        rows.append({"id": 7, "minhash": None})
+        supabase = _FakeSupabase(rows)
+
+        # 4 near-duplicates the earlier candidate 3, 2 the seen article 9, 7 has no signature
+        kept = asyncio.run(drop_near_duplicates(supabase, [3, 7, 1, 4, 2, 5], [9]))
+        if kept != [3, 7, 1, 5]:
+            print(f"❌ Kept {kept}, expected [3, 7, 1, 5]")
+            return False
+        print("✅ Near-duplicates dropped, candidate order kept")
+
+        kept = asyncio.run(drop_near_duplicates(supabase, [4, 3], []))
+        if kept != [4]:
+            print(f"❌ Kept {kept}, expected [4]")
+            return False
+        print("✅ The earlier of two near-duplicate candidates is the one kept")
+
+        if asyncio.run(drop_near_duplicates(supabase, [], [9])) != []:
+            print("❌ No candidates should give no articles")
+            return False
+        return True
+    except Exception as e:
+        print(f"❌ drop_near_duplicates error: {e}")
+        return False
+
+
+def main():
+    """Run all tests."""
+    print("🔍 Testing Near-Duplicate Detection")
+    print("=" * 50)
+
+    tests = [
+        test_signature,
+        test_banding,
+        test_drop_near_duplicates
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+        print()
+
+    print("=" * 50)
+    print(f"Test Results: {passed}/{total} tests passed")
+
+    if passed == total:
+        print("🎉 All near-duplicate tests passed!")
+        return True
+    else:
+        print("❌ Some tests failed")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)